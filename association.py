@@ -0,0 +1,122 @@
+# Associate pipe tags to their nearest pipe segments
+from collections import Counter, defaultdict
+from math import ceil, floor, hypot
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from components import Line
+from point import Point
+from topology import Segment, read_segments
+
+OK = 'ok'
+AMBIGUOUS = 'ambiguous'
+ORPHAN = 'orphan'
+
+
+class Association(NamedTuple):
+    tag_handle: str
+    tag: str
+    drawing: Optional[str]
+    segment: Optional[Segment]
+    distance: Optional[float]
+    status: str
+
+
+def distance_to_segment(point: Point, start: Point, end: Point) -> float:
+    dx = end.x - start.x
+    dy = end.y - start.y
+    length2 = dx * dx + dy * dy
+    if length2 == 0:
+        return hypot(point.x - start.x, point.y - start.y)
+    t = max(0.0, min(1.0, ((point.x - start.x) * dx + (point.y - start.y) * dy) / length2))
+    return hypot(point.x - (start.x + t * dx), point.y - (start.y + t * dy))
+
+
+class SegmentIndex:
+    """
+    Grid index of segments, each segment is put in every cell it passes
+    """
+    def __init__(self, segments: Iterable[Segment], cell_size: float):
+        self.cell_size = cell_size
+        self.segments = list(segments)
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for index, segment in enumerate(self.segments):
+            for cell in self._cells_of(segment):
+                self._cells[cell].append(index)
+
+    def cell(self, x: float, y: float) -> Tuple[int, int]:
+        return floor(x / self.cell_size), floor(y / self.cell_size)
+
+    def _cells_of(self, segment: Segment) -> set:
+        start, end = segment.start, segment.end
+        length = hypot(end.x - start.x, end.y - start.y)
+        steps = max(int(length / (self.cell_size / 2)), 1)
+        return {self.cell(start.x + (end.x - start.x) * i / steps, start.y + (end.y - start.y) * i / steps)
+                for i in range(steps + 1)}
+
+    def nearby(self, point: Point, radius: float) -> List[Tuple[float, Segment]]:
+        """
+        Segments within radius, nearest first
+        """
+        col, row = self.cell(point.x, point.y)
+        span = max(ceil(radius / self.cell_size), 1)
+        candidates = set()
+        for i in range(col - span, col + span + 1):
+            for j in range(row - span, row + span + 1):
+                candidates.update(self._cells.get((i, j), ()))
+        found = []
+        for index in candidates:
+            segment = self.segments[index]
+            distance = distance_to_segment(point, segment.start, segment.end)
+            if distance <= radius:
+                found.append((distance, segment))
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+
+def associate(tags: Iterable[Tuple[str, str, Optional[str], Point]], index: SegmentIndex, tolerance: float,
+              ambiguity: float = 1.2) -> List[Association]:
+    """
+    :param tags: (handle, tag, drawing tag, position)
+    :param index:
+    :param tolerance: max distance between tag and pipe
+    :param ambiguity: a tag is ambiguous if another pipe is within best distance * ambiguity
+    """
+    result = []
+    for handle, tag, drawing, position in tags:
+        found = index.nearby(position, tolerance)
+        if not found:
+            result.append(Association(handle, tag, drawing, None, None, ORPHAN))
+            continue
+        distance, segment = found[0]
+        status = OK
+        for other_distance, other in found[1:]:
+            if other.handle == segment.handle:
+                continue
+            if other_distance <= max(distance * ambiguity, distance + 1e-6):
+                status = AMBIGUOUS
+            break
+        result.append(Association(handle, tag, drawing, segment, distance, status))
+    return result
+
+
+def read_tags(lines: Iterable[Line]) -> List[Tuple[str, str, Optional[str], Point]]:
+    return [(line.handle, line.raw_tag, line.drawing.tag if line.drawing else None, line.position) for line in lines]
+
+
+def count_by_sheet(associations: Iterable[Association]) -> Dict[Optional[str], Counter]:
+    counts = defaultdict(Counter)
+    for association in associations:
+        counts[association.drawing][association.status] += 1
+    return dict(counts)
+
+
+def associate_pipe_tags(pnid, tolerance: float = 10, ambiguity: float = 1.2) -> List[Association]:
+    """
+    Associate every pipe tag of the document to its nearest pipe segment
+    :param pnid: PnID
+    """
+    index = SegmentIndex(read_segments(pnid), tolerance)
+    associations = associate(read_tags(pnid.lines), index, tolerance, ambiguity)
+    for drawing, counts in sorted(count_by_sheet(associations).items(), key=lambda item: str(item[0])):
+        print(f"[{drawing}] {counts[OK]} ok, {counts[AMBIGUOUS]} ambiguous, {counts[ORPHAN]} orphan")
+    return associations
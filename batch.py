@@ -0,0 +1,62 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from tracing import tracer
+
+
+def write(target, prop: str, value, on_write: Callable[[Any, str, Any], None] = None):
+    """
+    Single write outside a batch, reported to on_write as batch writes are
+    """
+    setattr(target, prop, value)
+    if on_write is not None:
+        on_write(target, prop, value)
+
+
+class EditBatch:
+    """
+    Collect property writes on COM objects and apply them in one pass.
+    Usage: batch = doc.new_batch()
+           batch.set(attr, 'TextString', 'hello')
+           batch.commit()
+    """
+    def __init__(self, doc=None, on_write: Callable[[Any, str, Any], None] = None):
+        """
+        :param doc: document for the undo mark
+        :param on_write: called with (target, prop, value) after each write
+        """
+        self.doc = doc
+        self.on_write = on_write
+        self._edits: Dict[Tuple[int, str], Tuple[Any, str, Any, Optional[Callable]]] = {}
+
+    def __len__(self):
+        return len(self._edits)
+
+    def set(self, target, prop: str, value, on_write: Callable[[Any, str, Any], None] = None):
+        """
+        :param on_write: called with (target, prop, value) after this write, e.g. to update a cached value
+        """
+        # later writes to the same property replace earlier ones
+        self._edits[(id(target), prop)] = (target, prop, value, on_write)
+
+    def commit(self) -> int:
+        """
+        Write all pending edits, wrapped in one undo mark when a document is given
+        :return: number of writes
+        """
+        counter = 0
+        with tracer.span("commit", edits=len(self._edits)):
+            if self.doc is not None:
+                self.doc.StartUndoMark()
+            try:
+                for target, prop, value, on_write in self._edits.values():
+                    setattr(target, prop, value)
+                    counter += 1
+                    if self.on_write is not None:
+                        self.on_write(target, prop, value)
+                    if on_write is not None:
+                        on_write(target, prop, value)
+            finally:
+                if self.doc is not None:
+                    self.doc.EndUndoMark()
+                self._edits.clear()
+        return counter
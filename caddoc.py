@@ -1,16 +1,22 @@
 import logging
+import os
 import re
+import time
 from collections import defaultdict
-from pathlib import Path
-from typing import List, Iterator, Iterable
-from uuid import uuid4
-
-from win32com.client import CastTo
+from itertools import count
+from fnmatch import fnmatchcase
+from typing import Any, Dict, List, Iterator, Iterable, Optional, Tuple
 
 import constants
 import dxf
+from batch import EditBatch
+from migration import Change, Rule, plan_changes, write_changelog, summarize
 from point import Point
-from utils import vt_int_array, vt_variant_array, vt_point, copy_attributes, copy_dynamic_properties, get_application
+from resolver import HandleResolver
+from text_index import TextIndex, build_text_index
+from tracing import tracer
+from utils import vt_int_array, vt_variant_array, vt_object_array, vt_point, lisp_point, cast_to, com_error, \
+    copy_attributes, copy_dynamic_properties, get_application, escape_wildcards, join_filter_names
 
 
 def get_acad_app(version=''):
@@ -29,43 +35,209 @@ def get_acad_app(version=''):
     return get_application(prog_id)
 
 
+def normalize_path(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
 def get_document(app, filename=None):
     # load current file
     if filename is None:
         return app.ActiveDocument
 
+    key = normalize_path(filename)
     for document in app.Documents:
-        if Path(document.FullName) == Path(filename):
+        if normalize_path(document.FullName) == key:
             return document
 
     return app.Documents.Open(filename)
 
 
+class EvictedDocument:
+    """
+    Placeholder of a document closed by a DocumentPool, any access raises until CADDoc.ensure_open
+    """
+    def __init__(self, name: str):
+        object.__setattr__(self, 'name', name)
+
+    def __getattr__(self, attr: str):
+        raise RuntimeError(f"{self.name} was closed by the document pool, call ensure_open first.")
+
+    def __setattr__(self, attr: str, value):
+        self.__getattr__(attr)
+
+
 class CADDoc:
-    def __init__(self, filepath=None):
-        self.app = get_acad_app()
+    # max number of live objects kept by the handle resolver
+    resolver_size = 4096
+    # prefix of temporary selection set names
+    selection_prefix = "pnid_toolkit_"
+
+    def __init__(self, filepath=None, load_data: bool = True, app=None, pool=None):
+        """
+        :param filepath: default is the active document
+        :param load_data:
+        :param app: AutoCAD application, default is a running instance.
+                    Could be a recording or replaying proxy, see recording.py
+        :param pool: DocumentPool for multi-file work, see pool.py
+        """
+        self.pool = pool
+        if app is None:
+            app = pool.app if pool is not None else get_acad_app()
+        self.app = app
         self.doc = None
-        self.blockrefs = defaultdict(list)
+        self.resolver = HandleResolver(None, self.resolver_size, self._on_write)
+        self.filepath = filepath
+        self._blockrefs = None
+        # blockref index as handles kept by the pool, resolved on first access
+        self._index_handles: Optional[Dict[str, List[str]]] = None
+        self._text_index = None
+        # anonymous block name -> effective name, per document
+        self._effective_names: Dict[str, str] = {}
+        self._anonymous_names: Optional[Dict[str, List[str]]] = None
+        self.load_data = load_data
+        # deterministic selection set names, for replaying recorded sessions, sets are deleted after use
+        self._selection_counter = count()
         # self.logger = logging.getLogger(__name__)
         self.load(filepath)
 
     def init_db(self):
-        self.blockrefs = self.gen_blockref_dict()
+        # indexed on first access
+        self._blockrefs = None
+        self._index_handles = None
+        self._text_index = None
+        self._anonymous_names = None
+
+    @property
+    def blockrefs(self) -> dict:
+        """
+        Full index of blockrefs by effective name, built on first access,
+        or resolved from the handles kept by the pool
+        """
+        if self._blockrefs is None:
+            if self._index_handles is not None:
+                self._blockrefs = self.resolve_index(self._index_handles)
+                self._index_handles = None
+            else:
+                self._blockrefs = self.gen_blockref_dict()
+        return self._blockrefs
+
+    @property
+    def text_index(self) -> TextIndex:
+        """
+        Inverted index of all texts, built on first access, updated by batch writes
+        """
+        if self._text_index is None:
+            self._text_index = build_text_index(self, self.locate_point)
+        return self._text_index
+
+    def locate_point(self, point: Point):
+        """
+        Drawing containing the point, none without drawings
+        """
+        return None
+
+    @property
+    def is_indexed(self) -> bool:
+        return self._blockrefs is not None or self._index_handles is not None
 
     def load(self, filepath=None):
-        self.doc = get_document(self.app, filepath)
+        self.filepath = filepath
+        if self.pool is not None and filepath is not None:
+            self.doc = self.pool.get(filepath, owner=self)
+        else:
+            self.doc = get_document(self.app, filepath)
+        self.resolver = HandleResolver(self.doc, self.resolver_size, self._on_write)
+        self._effective_names = {}
+        self._anonymous_names = None
+        self.remove_selection_sets()
         print(f"Current File: {self.doc.Name}")
-        self.init_db()
+        if self.load_data:
+            self.init_db()
+            if self.pool is not None and filepath is not None:
+                self._index_handles = self.pool.get_index(filepath)
+
+    def ensure_open(self):
+        """
+        Reopen the document if it was evicted from the pool
+        """
+        if isinstance(self.doc, EvictedDocument):
+            self.load(self.filepath)
+
+    def resolve(self, handle: str):
+        """
+        Entity of the handle, casted by its object name
+        """
+        return self.resolver.resolve(handle)
+
+    def resolve_many(self, handles: Iterable[str]) -> List:
+        return self.resolver.resolve_many(handles)
+
+    def delete(self, handle: str):
+        self.resolve(handle).Delete()
+        self.resolver.evict(handle)
+        if self._text_index is not None:
+            self._text_index.remove(handle)
+            # attributes of a blockref
+            self._text_index.remove_owner(handle)
+
+    def export_index(self) -> Optional[Dict[str, List[str]]]:
+        """
+        Blockref index as handles, which survive closing the document
+        """
+        if self._blockrefs is None:
+            # not resolved since reopened
+            return self._index_handles
+        return {name: [blockref.Handle for blockref in blockrefs] for name, blockrefs in self._blockrefs.items()}
+
+    def resolve_index(self, index: Dict[str, List[str]]) -> dict:
+        blockrefs = defaultdict(list)
+        for name, handles in index.items():
+            blockrefs[name] = [cast_to(self.doc.HandleToObject(handle), dxf.BlockRef.interface) for handle in handles]
+        return blockrefs
 
     def reload(self):
         self.init_db()
 
+    def effective_name(self, blockref, name: str = None) -> str:
+        """
+        Effective name of a blockref, EffectiveName is read once per anonymous block definition
+        :param blockref:
+        :param name: Name of the blockref if already read
+        """
+        if name is None:
+            name = blockref.Name
+        # only anonymous dynamic blockrefs differ, "*U..."
+        if not name.startswith("*"):
+            return name
+        try:
+            return self._effective_names[name]
+        except KeyError:
+            effective_name = self._effective_names[name] = blockref.EffectiveName
+            return effective_name
+
+    def new_batch(self) -> EditBatch:
+        return EditBatch(self.doc, self._on_write)
+
+    def _on_write(self, target, prop: str, value):
+        if prop == "TextString" and self._text_index is not None:
+            self._text_index.update(target.Handle, value)
+
     def reset_selection_sets(self):
         for index in reversed(range(self.doc.SelectionSets)):
             self.doc.SelectionSets.Item(index).Delete()
 
+    def remove_selection_sets(self):
+        """
+        Delete temporary selection sets left by a crashed run, their names would be taken again
+        """
+        for selection_set in [item for item in self.doc.SelectionSets if item.Name.startswith(self.selection_prefix)]:
+            selection_set.Delete()
+
+    def new_selection_set(self):
+        return self.doc.SelectionSets.Add(f"{self.selection_prefix}{next(self._selection_counter)}")
+
     def select(self, mode, point1: Point = None, point2: Point = None, filter_type=None, filter_data=None) -> List:
-        selection_set = self.doc.SelectionSets.Add(uuid4().hex)
+        selection_set = self.new_selection_set()
         if point1 and point2:
             point1 = vt_point(point1)
             point2 = vt_point(point2)
@@ -84,7 +256,7 @@ class CADDoc:
 
     def select_entities_by_name(self, dxf_entity: dxf.Entity, entity_name: str) -> List:
         entities = self._select_by_type_and_name(dxf_entity.type_name, entity_name)
-        return [CastTo(entity, dxf_entity.interface) for entity in entities]
+        return [cast_to(entity, dxf_entity.interface) for entity in entities]
 
     def gen_blockref_dict(self, by_select: bool = True) -> dict:
         print("Indexing blockrefs...")
@@ -93,13 +265,15 @@ class CADDoc:
         if not self.doc:
             return db
 
-        if not by_select:
-            blockrefs = self.iter_blockrefs()
-        else:
-            blockrefs = self.select_blockrefs()
-        for blockref in blockrefs:
-            db[blockref.EffectiveName].append(blockref)
-            counter += 1
+        with tracer.span("gen_blockref_dict") as span:
+            if not by_select:
+                blockrefs = self.iter_blockrefs()
+            else:
+                blockrefs = self.select_blockrefs()
+            for blockref in blockrefs:
+                db[self.effective_name(blockref)].append(blockref)
+                counter += 1
+            span.count(blockrefs=counter, names=len(db), anonymous=len(self._effective_names))
 
         print(f"Indexing complete, {counter} blockrefs.")
         return db
@@ -115,16 +289,69 @@ class CADDoc:
 
     def select_blockrefs(self, name: str = None) -> List:
         # not suit for select anonymous blockref by name, which name is "*U..."
-        # "name" is not "EffectiveName"
+        # "name" is not "EffectiveName", see select_blockrefs_by_names
         if name:
             return self.select_entities_by_name(dxf.BlockRef, name)
 
         return self.select_entities(dxf.BlockRef)
 
+    @property
+    def anonymous_names(self) -> Dict[str, List[str]]:
+        """
+        Anonymous block names "*U..." by effective name.
+        Names come from the Blocks collection, only names not resolved before in this document
+        are selected, one blockref read for each. Reset by init_db, e.g. after changing dynamic properties.
+        """
+        if self._anonymous_names is None:
+            with tracer.span("anonymous_names") as span:
+                anonymous = [block.Name for block in self.doc.Blocks if block.Name.upper().startswith("*U")]
+                unknown = [name for name in anonymous if name not in self._effective_names]
+                pending = set(unknown)
+                for name_filter in join_filter_names(escape_wildcards(name) for name in unknown):
+                    for blockref in self.select_entities_by_name(dxf.BlockRef, name_filter):
+                        name = blockref.Name
+                        if name in pending:
+                            pending.discard(name)
+                            self.effective_name(blockref, name)
+                            if not pending:
+                                break
+                span.count(blocks=len(anonymous), resolved=len(unknown))
+            names = defaultdict(list)
+            # unreferenced definitions are left out
+            for name in anonymous:
+                if name in self._effective_names:
+                    names[self._effective_names[name]].append(name)
+            self._anonymous_names = dict(names)
+        return self._anonymous_names
+
+    def expand_block_names(self, names: Iterable[str]) -> List[str]:
+        """
+        Selection filter names of effective names, with their anonymous names escaped
+        :param names: effective names, wildcards allowed, e.g. ["Connector_Main", "*_LOCAL*"]
+        """
+        names = list(names)
+        patterns = [name.upper() for name in names]
+        expanded = list(names)
+        for effective_name, anonymous in self.anonymous_names.items():
+            if any(fnmatchcase(effective_name.upper(), pattern) for pattern in patterns):
+                expanded.extend(escape_wildcards(name) for name in anonymous)
+        return expanded
+
+    def select_blockrefs_by_names(self, names: Iterable[str]) -> List:
+        """
+        Select blockrefs by effective names in one filtered selection, anonymous dynamic blockrefs included
+        :param names: e.g. ["pipe_tag", "STRAINER*"]
+        """
+        result = []
+        # long filters split, anonymous names accumulate
+        for name_filter in join_filter_names(self.expand_block_names(names)):
+            result.extend(self.select_entities_by_name(dxf.BlockRef, name_filter))
+        return result
+
     def iter_entities(self, dxf_entity: dxf.Entity) -> Iterator:
         for item in self.doc.ModelSpace:
             if item.ObjectName == dxf_entity.object_name:
-                ent = CastTo(item, dxf_entity.interface)
+                ent = cast_to(item, dxf_entity.interface)
                 yield ent
 
     def iter_blockrefs(self) -> Iterator:
@@ -133,6 +360,16 @@ class CADDoc:
     def get_blockrefs_by_name(self, name: str):
         return self.blockrefs.get(name)
 
+    def find_blockrefs(self, name_pattern: str, names: Iterable[str]) -> List:
+        """
+        Blockrefs by effective name, from the index when built, otherwise by a targeted selection
+        :param name_pattern: regex for the index
+        :param names: effective names for selection, wildcards allowed
+        """
+        if self.is_indexed:
+            return self.search_blockrefs(name_pattern)
+        return self.select_blockrefs_by_names(names)
+
     def search_blockrefs(self, name_pattern: str) -> List:
         result = []
         prog = re.compile(name_pattern)
@@ -148,15 +385,34 @@ class CADDoc:
         entities = self.select(constants.acSelectionSetAll, filter_type=filter_type, filter_data=filter_data)
         return entities
 
+    def select_filtered(self, filters: List[Tuple[int, Any]], point1: Point = None, point2: Point = None,
+                        crossing=True) -> List:
+        """
+        Select entities matching DXF group code filters, in the whole document or in an area
+        :param filters: [(group code, value), ...], e.g. [(0, "LINE,ARC"), (8, "PIPE")]
+        :param point1: area corner, area must be on screen
+        :param point2: opposite area corner
+        :param crossing:
+        """
+        filter_type = vt_int_array([code for code, _ in filters])
+        filter_data = vt_variant_array([value for _, value in filters])
+        if point1 is None or point2 is None:
+            mode = constants.acSelectionSetAll
+        elif crossing:
+            mode = constants.acSelectionSetCrossing
+        else:
+            mode = constants.acSelectionSetWindow
+        return self.select(mode, point1, point2, filter_type=filter_type, filter_data=filter_data)
+
     def select_entities(self, dxf_entity: dxf.Entity) -> List:
         entities = self._select_by_type(dxf_entity.type_name)
-        return [CastTo(entity, dxf_entity.interface) for entity in entities]
+        return [cast_to(entity, dxf_entity.interface) for entity in entities]
 
     def select_multi_entities(self, dxf_entities: Iterable[dxf.Entity]) -> List:
         selection = []
         for dxf_entity in set(dxf_entities):
             entities = self._select_by_type(dxf_entity.type_name)
-            selection.extend([CastTo(entity, dxf_entity.interface) for entity in entities])
+            selection.extend([cast_to(entity, dxf_entity.interface) for entity in entities])
 
         return selection
 
@@ -176,6 +432,38 @@ class CADDoc:
             mode = constants.acSelectionSetWindow
         return self.select(mode, point1, point2)
 
+    def move_entities(self, entities: Iterable, displacement: Point):
+        """
+        Move entities as one unit, by a single MOVE command on a selection set
+        instead of one Move call per entity. Returns when the command is done.
+        """
+        entities = list(entities)
+        if not entities:
+            return
+        with tracer.span("move_entities", entities=len(entities)):
+            selection_set = self.new_selection_set()
+            try:
+                selection_set.AddItems(vt_object_array(entities))
+                # named selection set to a LISP one, in AutoCAD without round trips
+                self.doc.SendCommand(
+                    f'(progn (vl-load-com) (setq ss (ssadd)) '
+                    f'(vlax-for obj (vla-item (vla-get-SelectionSets (vla-get-ActiveDocument (vlax-get-acad-object))) '
+                    f'"{selection_set.Name}") (ssadd (vlax-vla-object->ename obj) ss)) '
+                    f'(command "_.MOVE" ss "" "_non" \'(0 0 0) "_non" {lisp_point(displacement)}) (princ)) ')
+                self.wait_idle()
+            finally:
+                selection_set.Delete()
+
+    def wait_idle(self, interval: float = 0.05):
+        """
+        Wait until AutoCAD has finished commands sent by SendCommand
+        """
+        while not self.app.GetAcadState().IsQuiescent:
+            time.sleep(interval)
+
+    def zoom_extents(self):
+        self.app.ZoomExtents()
+
     def select_all_entities(self) -> List:
         return self.select(constants.acSelectionSetAll)
 
@@ -204,10 +492,55 @@ class CADDoc:
         for item in self.iter_all_texts():
             if (result := regex.sub(replacement, item.TextString)) != item.TextString:
                 item.TextString = result
+                self._on_write(item, "TextString", result)
                 counter += 1
 
         print(f'Replaced {counter} texts.')
 
+    def migrate_tags(self, rules: Iterable[Rule], changelog: str = None) -> List[Change]:
+        """
+        Plan all changes by rules, then apply them in one pass
+        :param rules: migration rules per category
+        :param changelog: path of changelog, for reverse migration
+        :return: applied changes
+        """
+        print("Planning tag migration.")
+        planned = plan_changes(self, rules)
+        batch = self.new_batch()
+        for change, target in planned:
+            batch.set(target, "TextString", change.new)
+        batch.commit()
+        changes = [change for change, _ in planned]
+        if changelog:
+            write_changelog(changes, changelog)
+        print(f"Migrated {len(changes)} texts: {summarize(changes)}")
+        return changes
+
+    def apply_changes(self, changes: Iterable[Change]) -> List[Change]:
+        """
+        Apply changes by handle, e.g. reverse_changes(read_changelog(path)).
+        Texts modified since the change, and texts deleted since, are skipped.
+        :return: applied changes
+        """
+        applied = []
+        missing = []
+        batch = self.new_batch()
+        for change in changes:
+            try:
+                target = self.resolve(change.handle)
+            # deleted entity, KeyError from stand-in documents
+            except (com_error, KeyError) as err:
+                missing.append(f"{change.handle} ({err})")
+                continue
+            if target.TextString == change.old:
+                batch.set(target, "TextString", change.new)
+                applied.append(change)
+        batch.commit()
+        print(f"Applied {len(applied)} changes.")
+        if missing:
+            print(f"Skipped {len(missing)} missing handles: {', '.join(missing)}")
+        return applied
+
     def replace_block(self, from_block_name, to_block_name):
         self.replace_blockrefs(self.blockrefs[from_block_name], to_block_name)
 
@@ -235,6 +568,9 @@ class CADDoc:
         copy_attributes(blockref, new_blockref)
         if new_blockref.IsDynamicBlock and blockref.IsDynamicBlock:
             copy_dynamic_properties(blockref, new_blockref)
+        if self._text_index is not None:
+            # copied texts
+            self._text_index.add_blockref(new_blockref)
         self.remove_blockref(blockref)
         return new_blockref
 
@@ -248,12 +584,18 @@ class CADDoc:
             z_scale,
             rotation,
             None)
-        self.blockrefs[blockref.EffectiveName].append(blockref)
+        self.blockrefs[self.effective_name(blockref)].append(blockref)
+        if self._text_index is not None:
+            self._text_index.add_blockref(blockref)
         return blockref
 
     def remove_blockref(self, blockref):
-        self.blockrefs[blockref.EffectiveName].remove(blockref)
+        handle = blockref.Handle
+        self.blockrefs[self.effective_name(blockref)].remove(blockref)
+        self.resolver.evict(handle)
         blockref.Delete()
+        if self._text_index is not None:
+            self._text_index.remove_owner(handle)
 
     def has_block(self, name):
         for block in self.doc.Blocks:
@@ -1,17 +1,19 @@
 from collections import defaultdict
-from typing import Iterable
+from typing import FrozenSet, Iterable, Optional, Set
 
 from components import Connector, MainConnector
 from config import load_config
 from pnid import PnID
 from pprint import PrettyPrinter
+from tracing import tracer
 
 
 def problem_line(connector: Connector, problem: str) -> dict:
     return {
         "problem": problem,
         # "target": conn.handle,
-        "number": connector.tag,
+        # also for connectors missing the attribute
+        "number": connector.record.attributes.get("TAG", ""),
         "drawing": connector.drawing.tag,
         "location": (round(connector.position.x, 2), round(connector.position.y, 2)),
     }
@@ -56,29 +58,37 @@ def describe(connector: Connector) -> str:
     return f"[{connector.drawing.tag}]:<{connector.tag}>{connector.position}"
 
 
+def check_main_connector(connector: MainConnector, config: dict) -> Optional[dict]:
+    try:
+        if is_excluded(connector, config):
+            return None
+        if not connector.tag:
+            return problem_line(connector, "Missing number")
+        elif not (connector.is_to or connector.is_from):
+            return problem_line(connector, "Missing route")
+        elif connector.is_entering != connector.is_from:
+            return problem_line(connector, "Wrong direction")
+        elif connector.is_to and (not number_matched(connector, config)):
+            return problem_line(connector, "Wrong number when exiting")
+        elif connector.is_off_drawing and connector.is_from and number_matched(connector, config):
+            return problem_line(connector, "Wrong number when entering")
+        elif connector.is_off_boundary and bool(connector.link_drawing):
+            return problem_line(connector, "P&ID No. not blank in off-boundary connector")
+        elif connector.is_off_drawing and (not bool(connector.link_drawing)):
+            return problem_line(connector, "Missing P&ID No. in off-drawing connector")
+    except KeyError as err:
+        return problem_line(connector, str(err))
+    return None
+
+
 def check_main(pnid: PnID, config: dict) -> list:
     connectors = pnid.main_connectors
     problems = []
-    for connector in connectors:
-        try:
-            if is_excluded(connector, config):
-                continue
-            if not connector.tag:
-                problems.append(problem_line(connector, "Missing number"))
-            elif not (connector.is_to or connector.is_from):
-                problems.append(problem_line(connector, "Missing route"))
-            elif connector.is_entering != connector.is_from:
-                problems.append(problem_line(connector, "Wrong direction"))
-            elif connector.is_to and (not number_matched(connector, config)):
-                problems.append(problem_line(connector, "Wrong number when exiting"))
-            elif connector.is_off_drawing and connector.is_from and number_matched(connector, config):
-                problems.append(problem_line(connector, "Wrong number when entering"))
-            elif connector.is_off_boundary and bool(connector.link_drawing):
-                problems.append(problem_line(connector, "P&ID No. not blank in off-boundary connector"))
-            elif connector.is_off_drawing and (not bool(connector.link_drawing)):
-                problems.append(problem_line(connector, "Missing P&ID No. in off-drawing connector"))
-        except KeyError as err:
-            problems.append(problem_line(connector, str(err)))
+    with tracer.span("check_main") as span:
+        for connector in connectors:
+            if (problem := check_main_connector(connector, config)) is not None:
+                problems.append(problem)
+        span.count(connectors=len(connectors), problems=len(problems))
     print(f"{len(problems)} problems detected:")
     return problems
 
@@ -94,11 +104,13 @@ def check_basic(connector: Connector) -> list:
 
 def check_utility(pnid: PnID, config: dict) -> list:
     problems = []
-    for connector in pnid.utility_connectors:
-        if is_excluded(connector, config):
-            continue
-        if not connector.tag:
-            problems.append(problem_line(connector, "Missing number"))
+    with tracer.span("check_utility") as span:
+        for connector in pnid.utility_connectors:
+            if is_excluded(connector, config):
+                continue
+            if not connector.tag:
+                problems.append(problem_line(connector, "Missing number"))
+        span.count(connectors=len(pnid.utility_connectors), problems=len(problems))
 
     return problems
 
@@ -111,33 +123,51 @@ def show_links(main_connectors: Iterable[MainConnector], config: dict):
     problems = []
     links_report = []
     links = defaultdict(list)
-    # build db
-    for connector in main_connectors:
-        links[connector.tag].append(connector)
-    # print(links)
-    # make pair
-    for tag in sorted(links):
-        if len(links[tag]) < 3:
-            start_connector = None
-            end_connector = None
-            for connector in links[tag]:
-                if connector.is_from:
-                    end_connector = connector
-                elif connector.is_to:
-                    start_connector = connector
-            if start_connector and end_connector:
-                start_info = f'[{get_dwg_number(start_connector, config)}]{end_connector.endpoint}'
-                end_info = f'[{get_dwg_number(end_connector, config)}]{start_connector.endpoint}'
-                links_report.append(f'{tag}: {start_info} -> {end_info}')
-        else:
-            c_line = ""
-            for c in links[tag]:
-                c_line += describe(c)
-            problems.append(f'{tag}: {c_line}')
+    with tracer.span("show_links") as span:
+        # build db
+        for connector in main_connectors:
+            links[connector.tag].append(connector)
+        # print(links)
+        # make pair
+        for tag in sorted(links):
+            if len(links[tag]) < 3:
+                start_connector = None
+                end_connector = None
+                for connector in links[tag]:
+                    if connector.is_from:
+                        end_connector = connector
+                    elif connector.is_to:
+                        start_connector = connector
+                if start_connector and end_connector:
+                    start_info = f'[{get_dwg_number(start_connector, config)}]{end_connector.endpoint}'
+                    end_info = f'[{get_dwg_number(end_connector, config)}]{start_connector.endpoint}'
+                    links_report.append(f'{tag}: {start_info} -> {end_info}')
+            else:
+                c_line = ""
+                for c in links[tag]:
+                    c_line += describe(c)
+                problems.append(f'{tag}: {c_line}')
+        span.count(links=len(links_report), problems=len(problems))
 
     return links_report, problems
 
 
+def linked_sheets(main_connectors: Iterable[MainConnector], config: dict) -> Set[FrozenSet[str]]:
+    """
+    Pairs of drawing numbers linked by TO/FROM connectors of same tag
+    """
+    exits = {}
+    entries = {}
+    for connector in main_connectors:
+        if connector.drawing is None or not connector.drawing.has_title or not connector.tag:
+            continue
+        if connector.is_to:
+            exits[connector.tag] = get_dwg_number(connector, config)
+        elif connector.is_from:
+            entries[connector.tag] = get_dwg_number(connector, config)
+    return {frozenset((exits[tag], entries[tag])) for tag in exits.keys() & entries.keys()}
+
+
 def report(pnid: PnID, config: dict):
     connectors = [connector for connector in pnid.main_connectors if not is_excluded(connector, config)]
     links, problems = show_links(connectors, config)
@@ -150,7 +180,7 @@ def report(pnid: PnID, config: dict):
 
 
 if __name__ == "__main__":
-    p = PnID()
     conf = load_config(r'..\config.ini')
+    p = PnID(config=conf)
     check(p, conf)
     report(p, conf)
@@ -0,0 +1,186 @@
+# Incremental connector checking, sheets are re-checked only when their content changed.
+# Each sheet gets a fingerprint of the blockrefs inside its box, check results are cached by sheet.
+import hashlib
+import json
+import os
+from pprint import PrettyPrinter
+from typing import Dict, Iterable, List, NamedTuple, Set
+
+from checker.connectors import check_main_connector
+from components import MainConnector
+from config import load_config
+from drawing import Drawing
+from pnid import PnID
+from point import Point
+from records import BlockRefRecord
+from registry import MAIN_CONNECTOR
+from tracing import tracer
+
+_CACHE_VERSION = 2
+# config sections check results depend on
+_CONFIG_SECTIONS = ('drawing', 'connector', 'names')
+# blockrefs with attributes
+_SCAN_FILTERS = [(0, "INSERT"), (66, 1)]
+
+
+class SheetScan(NamedTuple):
+    """
+    Blockrefs of a sheet, read cheaply for fingerprinting
+    """
+    drawing: Drawing
+    fingerprint: str
+    # [(blockref, name, attributes)]
+    entries: list
+
+
+def read_entry(blockref) -> tuple:
+    # Name changes with dynamic properties, anonymous *U names are kept as they are
+    attributes = {attr.TagString: attr.TextString for attr in blockref.GetAttributes()}
+    return blockref.Handle, blockref.Name, Point(*blockref.InsertionPoint), attributes
+
+
+def fingerprint(tag: str, entries: Iterable[tuple]) -> str:
+    """
+    Hash of handles, names, positions and attribute values
+    """
+    digest = hashlib.sha1(tag.encode('utf8'))
+    for handle, name, position, attributes in sorted(entries, key=lambda entry: entry[0]):
+        digest.update(f"{handle}|{name}|{position.x:.3f},{position.y:.3f}".encode('utf8'))
+        for attr_tag in sorted(attributes):
+            digest.update(f"|{attr_tag}={attributes[attr_tag]}".encode('utf8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def scan_sheet(pnid: PnID, drawing: Drawing) -> SheetScan:
+    entries = []
+    blockrefs = []
+    for blockref in pnid.select_filtered(_SCAN_FILTERS, drawing.min_point, drawing.max_point):
+        entry = read_entry(blockref)
+        # same rule as PnID.locate
+        if pnid.locate_point(entry[2]) is drawing:
+            entries.append(entry)
+            blockrefs.append(blockref)
+    return SheetScan(drawing, fingerprint(drawing.tag, entries), list(zip(blockrefs, entries)))
+
+
+def scan_sheets(pnid: PnID) -> Dict[str, SheetScan]:
+    with tracer.span("scan_sheets") as span:
+        pnid.zoom_extents()
+        scans = {tag: scan_sheet(pnid, drawing) for tag, drawing in pnid.sheets.items()}
+        span.count(sheets=len(scans), blockrefs=sum(len(scan.entries) for scan in scans.values()))
+    return scans
+
+
+def get_main_connectors(pnid: PnID, scan: SheetScan) -> List[MainConnector]:
+    """
+    Main connectors of a scanned sheet, effective names are read once per anonymous block
+    """
+    connectors = []
+    for blockref, (_, name, _, _) in scan.entries:
+        effective_name = pnid.effective_name(blockref, name)
+        if pnid.registry.classify(effective_name) != MAIN_CONNECTOR:
+            continue
+        record = BlockRefRecord.from_blockref(blockref, effective_name)
+        connector = MainConnector.from_record(record, pnid.resolver)
+        connector.drawing = scan.drawing
+        connectors.append(connector)
+    return connectors
+
+
+def sheet_links(connectors: Iterable[MainConnector]) -> List[str]:
+    return sorted({connector.link_drawing for connector in connectors if connector.link_drawing})
+
+
+def linked_tags(links: Iterable[str], tags: Iterable[str], config: dict) -> Set[str]:
+    """
+    Sheet tags referred by P&ID No. values
+    """
+    digits = config["drawing"]["number_digits"]
+    numbers = {link[-digits:] for link in links}
+    return {tag for tag in tags if tag[-digits:] in numbers}
+
+
+def config_hash(config: dict) -> str:
+    sections = {section: config.get(section) for section in _CONFIG_SECTIONS}
+    return hashlib.sha1(json.dumps(sections, sort_keys=True).encode('utf8')).hexdigest()
+
+
+def load_cache(path: str, config: dict) -> Dict[str, dict]:
+    """
+    Cached sheets, empty when written by another version or with another config
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf8') as file:
+        data = json.load(file)
+    if data.get('version') != _CACHE_VERSION or data.get('config') != config_hash(config):
+        return {}
+    return data['sheets']
+
+
+def save_cache(path: str, sheets: Dict[str, dict], config: dict):
+    with open(path, 'w', encoding='utf8') as file:
+        json.dump({'version': _CACHE_VERSION, 'config': config_hash(config), 'sheets': sheets}, file,
+                  ensure_ascii=False)
+
+
+def changed_sheets(scans: Dict[str, SheetScan], cache: Dict[str, dict]) -> Set[str]:
+    return {tag for tag, scan in scans.items() if tag not in cache or cache[tag]['fingerprint'] != scan.fingerprint}
+
+
+def affected_sheets(scans: Dict[str, SheetScan], cache: Dict[str, dict], config: dict,
+                    changed: Set[str]) -> Set[str]:
+    """
+    Changed sheets, with sheets linked to them before the change
+    """
+    affected = set(changed)
+    for tag, entry in cache.items():
+        if tag in scans and linked_tags(entry['links'], changed, config):
+            affected.add(tag)
+    for tag in changed & cache.keys():
+        affected |= linked_tags(cache[tag]['links'], scans, config)
+    return affected
+
+
+def check_sheet(pnid: PnID, scan: SheetScan, config: dict) -> dict:
+    connectors = get_main_connectors(pnid, scan)
+    problems = [problem for problem in (check_main_connector(connector, config) for connector in connectors)
+                if problem is not None]
+    return {'fingerprint': scan.fingerprint, 'problems': problems, 'links': sheet_links(connectors)}
+
+
+def check_main_incremental(pnid: PnID, config: dict, cache_path: str) -> list:
+    """
+    check_main with sheet cache.
+    Changed sheets are re-checked with their direct link partners, before and after the change.
+    :param pnid:
+    :param config:
+    :param cache_path: JSON file of fingerprints, problems and links by sheet
+    """
+    cache = load_cache(cache_path, config)
+    scans = scan_sheets(pnid)
+    with tracer.span("check_main_incremental") as span:
+        changed = changed_sheets(scans, cache)
+        affected = affected_sheets(scans, cache, config, changed)
+        sheets = {tag: check_sheet(pnid, scans[tag], config) for tag in sorted(affected)}
+        # sheets newly linked by changed sheets, not expanded further
+        partners = set()
+        for tag in changed:
+            partners |= linked_tags(sheets[tag]['links'], scans, config)
+        for tag in sorted(partners - sheets.keys()):
+            sheets[tag] = check_sheet(pnid, scans[tag], config)
+        checked = len(sheets)
+        for tag in scans.keys() - sheets.keys():
+            sheets[tag] = cache[tag]
+        span.count(sheets=len(scans), changed=len(changed), checked=checked)
+    save_cache(cache_path, sheets, config)
+    problems = [problem for tag in sorted(sheets) for problem in sheets[tag]['problems']]
+    print(f"{checked} of {len(scans)} sheets checked, {len(problems)} problems detected:")
+    return problems
+
+
+if __name__ == "__main__":
+    conf = load_config(r'..\config.ini')
+    p = PnID(config=conf)
+    PrettyPrinter().pprint(check_main_incremental(p, conf, 'connectors.cache.json'))
@@ -1,19 +1,23 @@
 from pnid import PnID
+from registry import STRAINER
+from tracing import tracer
 from utils import get_attribute
 
 
 def get_strainers(pnid: PnID):
-    return pnid.search_blockrefs(r'STRAINER_.*')
+    return pnid.find_category(STRAINER)
 
 
 def show_strainers(pnid: PnID):
     print('===strainers===')
     counter = 1
-    for strainer in get_strainers(pnid):
-        if drawing := pnid.locate(strainer):
-            tag = get_attribute(strainer, 'TAG').TextString
-            print(f'{counter}[{drawing.tag}] {tag}')
-            counter += 1
+    with tracer.span("show_strainers") as span:
+        for strainer in get_strainers(pnid):
+            if drawing := pnid.locate(strainer):
+                tag = get_attribute(strainer, 'TAG').TextString
+                print(f'{counter}[{drawing.tag}] {tag}')
+                counter += 1
+        span.count(strainers=counter - 1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,145 @@
+# Instrument loop consistency, bubbles are grouped by (loop code, unit, sequence) in one pass
+import re
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from checker.connectors import linked_sheets
+from components import Bubble, get_loop_code, is_instrument_code
+from config import load_config
+from pnid import PnID
+from tracing import tracer
+
+
+class BubbleRecord(NamedTuple):
+    handle: str
+    code: str
+    number: str
+    unit: str
+    sequence: str
+    suffix: str
+    drawing: Optional[str]
+
+    @property
+    def tag(self) -> str:
+        return f'{self.code}-{self.number}'
+
+
+class LoopProblem(NamedTuple):
+    problem: str
+    loop: str
+    tags: Tuple[str, ...]
+    drawings: Tuple[str, ...]
+
+
+def read_bubbles(bubbles: Iterable[Bubble], config: dict) -> Tuple[List[BubbleRecord], List[LoopProblem]]:
+    """
+    Read attribute values once per bubble
+    :return: (records, problems of unparsable numbers)
+    """
+    pattern = re.compile(r'(\d{%d})(\d+)([A-Z]*)' % config["drawing"]["unit_digits"])
+    records = []
+    problems = []
+    for bubble in bubbles:
+        code = bubble.code
+        number = bubble.number
+        drawing = bubble.drawing.tag if bubble.drawing else None
+        match = pattern.fullmatch(number)
+        if not code or not match:
+            problems.append(LoopProblem("Invalid tag", f'{code}-{number}', (f'{code}-{number}',), (drawing,)))
+            continue
+        unit, sequence, suffix = match.groups()
+        records.append(BubbleRecord(bubble.handle, code, number, unit, sequence, suffix, drawing))
+    return records, problems
+
+
+def group_loops(records: Iterable[BubbleRecord]) -> Dict[Tuple[str, str, str], List[BubbleRecord]]:
+    loops = defaultdict(list)
+    for record in records:
+        loops[(get_loop_code(record.code), record.unit, record.sequence)].append(record)
+    return loops
+
+
+def loop_name(key: Tuple[str, str, str]) -> str:
+    loop_code, unit, sequence = key
+    return f'{loop_code}-{unit}{sequence}'
+
+
+def is_connected(drawings: Set[str], links: Set[FrozenSet[str]]) -> bool:
+    """
+    Drawings of a loop are related if they are connected by links among themselves
+    """
+    if len(drawings) < 2:
+        return True
+    neighbours = defaultdict(set)
+    for link in links:
+        if len(link) == 2 and link <= drawings:
+            first, second = link
+            neighbours[first].add(second)
+            neighbours[second].add(first)
+    start = next(iter(drawings))
+    visited = {start}
+    stack = [start]
+    while stack:
+        for other in neighbours[stack.pop()]:
+            if other not in visited:
+                visited.add(other)
+                stack.append(other)
+    return visited == drawings
+
+
+def check_loop(key: Tuple[str, str, str], members: List[BubbleRecord], links: Set[FrozenSet[str]],
+               config: dict) -> List[LoopProblem]:
+    name = loop_name(key)
+    tags = tuple(member.tag for member in members)
+    drawings = {member.drawing[-config["drawing"]["number_digits"]:] for member in members if member.drawing}
+    problems = []
+
+    def problem(text: str, problem_tags: Tuple[str, ...] = tags):
+        problems.append(LoopProblem(text, name, problem_tags, tuple(sorted(drawings))))
+
+    codes = [member.code for member in members if is_instrument_code(member.code)]
+    if any(code.endswith('T') for code in codes) and not any('I' in code[1:] for code in codes):
+        problem("Transmitter without indicator")
+
+    if not is_connected(drawings, links):
+        problem("Loop spread across unrelated drawings")
+
+    seen = defaultdict(list)
+    suffixes = defaultdict(set)
+    for member in members:
+        seen[(member.code, member.suffix)].append(member.tag)
+        suffixes[member.code].add(member.suffix)
+    for duplicated in seen.values():
+        if len(duplicated) > 1:
+            problem("Duplicate tag", tuple(duplicated))
+    for code, code_suffixes in suffixes.items():
+        if '' in code_suffixes and len(code_suffixes) > 1:
+            problem("Suffix collision", tuple(tag for tag in tags if tag.startswith(f'{code}-')))
+    return problems
+
+
+def check_loops(bubbles: Iterable[Bubble], config: dict, links: Set[FrozenSet[str]] = frozenset()) -> List[LoopProblem]:
+    """
+    :param bubbles:
+    :param config:
+    :param links: linked drawing numbers, see checker.connectors.linked_sheets
+    :return: problems as structured records
+    """
+    with tracer.span("check_loops") as span:
+        records, problems = read_bubbles(bubbles, config)
+        loops = group_loops(records)
+        for key, members in loops.items():
+            problems.extend(check_loop(key, members, links, config))
+        span.count(bubbles=len(records), loops=len(loops), problems=len(problems))
+    print(f"{len(loops)} loops, {len(problems)} problems detected.")
+    return problems
+
+
+def check(pnid: PnID, config: dict) -> List[LoopProblem]:
+    return check_loops(pnid.bubbles, config, linked_sheets(pnid.main_connectors, config))
+
+
+if __name__ == '__main__':
+    conf = load_config(r'..\config.ini')
+    for loop_problem in check(PnID(config=conf), conf):
+        print(loop_problem)
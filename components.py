@@ -1,48 +1,98 @@
 import re
 from collections import namedtuple
-from typing import Optional, NamedTuple
+from typing import Callable, Optional, NamedTuple
 
+from batch import write
 from drawing import Drawing
 from point import Point
-from utils import extract_attributes, extract_dynamic_properties, get_attribute, get_attributes, get_dynamic_properties
+from records import BlockRefRecord
+from utils import get_attributes, get_dynamic_property
 
 
 class BlockRefWrapper:
     """
     BlockRef Wrapper
+    Values are read once into a record, COM objects are resolved by handle only when writing.
     """
-    def __init__(self, blockref):
-        self.attributes = get_attributes(blockref)
-        self.dynamic_properties = get_dynamic_properties(blockref)
+    def __init__(self, blockref, resolver: Callable[[str], object] = None, name: str = None):
+        """
+        :param blockref:
+        :param resolver: function returns COM object of a handle, e.g. CADDoc.resolver
+        :param name: effective name if already known
+        """
+        self.record = BlockRefRecord.from_blockref(blockref, name)
+        if resolver is None:
+            resolver = blockref.Document.HandleToObject
+        self.resolver = resolver
         self.drawing: Optional[Drawing] = None
-        self.ent = blockref
 
     def __repr__(self):
         return f"BlockRef('{self.name}')"
 
+    @classmethod
+    def from_record(cls, record: BlockRefRecord, resolver: Callable[[str], object]):
+        """
+        Wrap an already read record, without COM access
+        """
+        target = cls.__new__(cls)
+        target.record = record
+        target.resolver = resolver
+        target.drawing = None
+        return target
+
+    @property
+    def ent(self):
+        """
+        Live blockref
+        """
+        return self.resolver(self.handle)
+
+    @property
+    def attributes(self) -> dict:
+        """
+        Live attribute references
+        """
+        return get_attributes(self.ent)
+
+    def get_attribute(self, tag: str):
+        """
+        Live attribute reference
+        """
+        return self.resolver(self.record.attribute_handles[tag])
+
     def get_attribute_text(self, tag: str) -> str:
-        return self.attributes[tag].TextString
+        return self.record.attributes[tag]
 
-    def set_attribute_text(self, tag: str, text: str):
-        self.attributes[tag].TextString = text
+    def set_attribute_text(self, tag: str, text: str, batch=None):
+        """
+        :param tag:
+        :param text:
+        :param batch: EditBatch, write later within the batch
+        """
+        if batch is None:
+            write(self.get_attribute(tag), 'TextString', text, getattr(self.resolver, 'on_write', None))
+        else:
+            batch.set(self.get_attribute(tag), 'TextString', text)
+        self.record.attributes[tag] = text
 
     def get_dynamic_property_value(self, name: str):
-        return self.dynamic_properties[name].Value
+        return self.record.properties[name]
 
     def set_dynamic_property_value(self, name: str, value):
-        self.dynamic_properties[name].Value = value
+        get_dynamic_property(self.ent, name).Value = value
+        self.record.properties[name] = value
 
     @property
     def position(self) -> Point:
-        return Point(*self.ent.InsertionPoint)
+        return self.record.position
 
     @property
     def name(self) -> str:
-        return self.ent.EffectiveName
+        return self.record.name
 
     @property
     def handle(self) -> str:
-        return self.ent.Handle
+        return self.record.handle
 
 
 class Component(BlockRefWrapper):
@@ -62,31 +112,31 @@ class Component(BlockRefWrapper):
 class Connector(Component):
     @property
     def tag_attr(self):
-        return self.attributes["TAG"]
+        return self.get_attribute("TAG")
 
     @property
     def link_attr(self):
-        return self.attributes["PID.No"]
+        return self.get_attribute("PID.No")
 
     @property
     def service_attr(self):
-        return self.attributes["Service"]
+        return self.get_attribute("Service")
 
     @property
     def description_attr(self):
-        return self.attributes["DESC"]
+        return self.get_attribute("DESC")
 
     @property
     def tag(self) -> str:
-        return self.tag_attr.TextString
+        return self.get_attribute_text("TAG")
 
     @property
     def link_drawing(self) -> str:
-        return self.link_attr.TextString
+        return self.get_attribute_text("PID.No")
 
     @property
     def service(self) -> str:
-        return self.service_attr.TextString
+        return self.get_attribute_text("Service")
 
 
 class UtilityConnector(Connector):
@@ -121,7 +171,7 @@ class MainConnector(Connector):
 
     @property
     def route_attr(self):
-        return self.attributes["OriginOrDestination"]
+        return self.get_attribute("OriginOrDestination")
 
     @property
     def is_flip(self) -> bool:
@@ -140,11 +190,11 @@ class MainConnector(Connector):
 
     @property
     def route(self) -> str:
-        return self.route_attr.TextString
+        return self.get_attribute_text("OriginOrDestination")
 
     @route.setter
     def route(self, value: str):
-        self.route_attr.TextString = value
+        self.set_attribute_text("OriginOrDestination", value)
 
     @property
     def endpoint(self) -> str:
@@ -189,27 +239,27 @@ class MainConnector(Connector):
 class Bubble(Component):
     @property
     def code_attr(self):
-        return self.attributes['FUNCTION']
+        return self.get_attribute('FUNCTION')
 
     @property
     def number_attr(self):
-        return self.attributes['TAG']
+        return self.get_attribute('TAG')
 
     @property
     def code(self) -> str:
-        return self.code_attr.TextString
+        return self.get_attribute_text('FUNCTION')
 
     @code.setter
     def code(self, value: str):
-        self.code_attr.TextString = value
+        self.set_attribute_text('FUNCTION', value)
 
     @property
     def number(self) -> str:
-        return self.number_attr.TextString
+        return self.get_attribute_text('TAG')
 
     @number.setter
     def number(self, value: str):
-        self.number_attr.TextString = value
+        self.set_attribute_text('TAG', value)
 
     @property
     def is_gauge(self):
@@ -229,7 +279,7 @@ class Bubble(Component):
 
     @property
     def is_instrument(self):
-        return self.code not in ['PSV', 'PRV', 'FO', 'YL', 'HS', 'SC']
+        return is_instrument_code(self.code)
 
     @property
     def tag(self):
@@ -237,21 +287,56 @@ class Bubble(Component):
 
     @property
     def loop_code(self):
-        if not self.is_instrument:
-            return self.code
-            # 'PD', 'TD' for PDT, TDT
-        elif self.code[1] == 'D':
-            return self.code[:2]
-        # 'PG', 'TG'
-        elif self.is_gauge:
-            return self.code
-        else:
-            return self.code[0]
+        return get_loop_code(self.code)
+
+
+def is_instrument_code(code: str) -> bool:
+    return code not in ['PSV', 'PRV', 'FO', 'YL', 'HS', 'SC']
+
+
+def get_loop_code(code: str) -> str:
+    if not is_instrument_code(code):
+        return code
+        # 'PD', 'TD' for PDT, TDT
+    elif code[1:2] == 'D':
+        return code[:2]
+    # 'PG', 'TG'
+    elif code.endswith('G'):
+        return code
+    else:
+        return code[:1]
+
+
+class Valve(Component):
+    # block name as 'VALVE_GATE', 'VALVE_BALL_FLANGED'
+    name_pattern = r'VALVE_([A-Z]+)'
+
+    def __init__(self, blockref, resolver: Callable[[str], object] = None, name: str = None):
+        super().__init__(blockref, resolver, name)
+        self.type_name = parse_valve_type(self.name)
+        self.code = None
+        self.number = None
+        # drawing number part of number
+        self.dwg_number = None
+        self.tag_text = None
+
+    @property
+    def tag(self):
+        if not self.number:
+            return ''
+        return f'{self.code}-{self.number}'
+
+
+def parse_valve_type(name: str) -> str:
+    match = re.match(Valve.name_pattern, name)
+    if match:
+        return match.group(1)
+    return ''
 
 
 class Line(Component):
-    def __init__(self, blockref):
-        super().__init__(blockref)
+    def __init__(self, blockref, resolver: Callable[[str], object] = None, name: str = None):
+        super().__init__(blockref, resolver, name)
         self._service, self._number, self._size, self._spec, self._insulation = parse_line_tag(self.raw_tag)
 
     def get_tag(self):
@@ -281,7 +366,7 @@ class Line(Component):
         Sync 'TAG' of blockref with generated tag
         :return:
         """
-        self.attributes['TAG'] = self.tag
+        self.set_attribute_text('TAG', self.tag)
 
     @property
     def service(self):
@@ -5,6 +5,15 @@ def load_config(file=None):
     config = configparser.ConfigParser()
     if file is not None:
         config.read(file)
+    names = {}
+    # block name conventions by category, see registry.py
+    if config.has_section('name_patterns'):
+        for category, pattern in config.items('name_patterns'):
+            names.setdefault(category, {})['pattern'] = pattern
+    if config.has_section('name_selections'):
+        for category, value in config.items('name_selections'):
+            wildcards = [name.strip() for name in value.split(',') if name.strip()]
+            names.setdefault(category, {})['wildcards'] = wildcards
     return {
         'drawing': {
             'number_digits': config.getint(section='drawing', option='number_digits', fallback=4),
@@ -14,7 +23,8 @@ def load_config(file=None):
         },
         'connector': {
             'number_digits': config.getint(section='connector', option='number_digits', fallback=6),
-        }
+        },
+        'names': names,
     }
 
 
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# Pair unnumbered TO/FROM main connectors by endpoint sheet and service, then number them
+# as '<dwg number><seq>' of the exiting sheet, see checker.connectors.number_matched
+from collections import defaultdict, deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from components import MainConnector
+from config import load_config
+from ordering import COLUMNS, order_items
+from pnid import PnID
+from text_index import tokenize
+from tracing import tracer
+
+
+class Pairing(NamedTuple):
+    number: str
+    exit: MainConnector
+    entry: Optional[MainConnector]
+    # sheet tag on the other side, written to P&ID No., blank off boundary
+    target: str
+
+
+def sheet_keys(sheets: Iterable[str], config: dict) -> Dict[str, str]:
+    """
+    Sheet tag by full tag and by drawing number, e.g. 'P2401' and '401'
+    """
+    digits = config["drawing"]["number_digits"]
+    keys = {}
+    for tag in sheets:
+        keys[tag.upper()] = tag
+        keys.setdefault(tag[-digits:].upper(), tag)
+    return keys
+
+
+def target_sheet(connector: MainConnector, keys: Dict[str, str]) -> Optional[str]:
+    """
+    Sheet on the other side, from P&ID No. or from the endpoint text
+    """
+    own = connector.drawing.tag
+    for text in (connector.link_drawing, connector.endpoint):
+        # full tags before drawing numbers
+        for token in sorted(tokenize(text or ''), key=lambda item: (-len(item), item)):
+            if (tag := keys.get(token)) is not None and tag != own:
+                return tag
+    return None
+
+
+def index_entries(connectors: Iterable[MainConnector],
+                  keys: Dict[str, str]) -> Tuple[Dict[Tuple[str, str, str], deque], List[MainConnector]]:
+    """
+    Entering connectors by (origin sheet, sheet, service)
+    :return: (index, connectors of unknown origin)
+    """
+    entries = defaultdict(deque)
+    unresolved = []
+    for connector in connectors:
+        if (origin := target_sheet(connector, keys)) is not None:
+            entries[(origin, connector.drawing.tag, connector.service)].append(connector)
+        else:
+            unresolved.append(connector)
+    return entries, unresolved
+
+
+class SheetCounter:
+    """
+    Next free connector number per sheet, skipping numbers in use
+    """
+    def __init__(self, used: Iterable[str], config: dict):
+        self.used = set(used)
+        self.digits = config["drawing"]["number_digits"]
+        self.seq_digits = config["connector"]["number_digits"] - self.digits
+        self._next: Dict[str, int] = defaultdict(lambda: 1)
+
+    def take(self, sheet: str) -> str:
+        prefix = sheet[-self.digits:]
+        seq = self._next[sheet]
+        while f"{prefix}{seq:0{self.seq_digits}d}" in self.used:
+            seq += 1
+        if seq >= 10 ** self.seq_digits:
+            raise ValueError(f"No connector number left on sheet {sheet}.")
+        number = f"{prefix}{seq:0{self.seq_digits}d}"
+        self.used.add(number)
+        self._next[sheet] = seq + 1
+        return number
+
+
+def pair_connectors(connectors: List[MainConnector], sheets: Iterable[str],
+                    config: dict) -> Tuple[List[Pairing], List[MainConnector]]:
+    """
+    Match unnumbered exits with unnumbered entries through hash indexes, numbers assigned in reading order
+    :return: (pairings, connectors left unmatched)
+    """
+    keys = sheet_keys(sheets, config)
+    placed = [connector for connector in connectors if connector.drawing is not None and connector.drawing.has_title]
+    exits = [connector for connector in placed if connector.is_to and not connector.tag]
+    entries, unmatched = index_entries((connector for connector in placed if connector.is_from and not connector.tag),
+                                       keys)
+    counter = SheetCounter((connector.tag for connector in connectors if connector.tag), config)
+    pairings = []
+    for connector in order_items(exits, lambda item: item.position, COLUMNS):
+        sheet = connector.drawing.tag
+        if connector.is_off_boundary:
+            # leaves the project, P&ID No. stays blank
+            pairings.append(Pairing(counter.take(sheet), connector, None, ''))
+            continue
+        target = target_sheet(connector, keys)
+        if target is None:
+            unmatched.append(connector)
+            continue
+        candidates = entries.get((sheet, target, connector.service))
+        entry = candidates.popleft() if candidates else None
+        pairings.append(Pairing(counter.take(sheet), connector, entry, target))
+    for candidates in entries.values():
+        unmatched.extend(candidates)
+    return pairings, unmatched
+
+
+def number_connectors(pnid: PnID, config: dict) -> List[Pairing]:
+    """
+    Number and link unnumbered main connectors, written in one batch
+    """
+    with tracer.span("number_connectors") as span:
+        pairings, unmatched = pair_connectors(pnid.main_connectors, pnid.sheets, config)
+        batch = pnid.new_batch()
+        for number, exit_connector, entry_connector, target in pairings:
+            exit_connector.set_attribute_text("TAG", number, batch)
+            # resolved target sheet, also without an entry to pair with
+            exit_connector.set_attribute_text("PID.No", target, batch)
+            if entry_connector is None:
+                continue
+            entry_connector.set_attribute_text("TAG", number, batch)
+            entry_connector.set_attribute_text("PID.No", exit_connector.drawing.tag, batch)
+        batch.commit()
+        span.count(pairs=sum(1 for pairing in pairings if pairing.entry), exits=len(pairings),
+                   unmatched=len(unmatched))
+    print(f"{len(pairings)} connectors numbered, {sum(1 for pairing in pairings if pairing.entry)} paired.")
+    for connector in unmatched:
+        print(f"Unmatched: [{connector.drawing.tag}] {connector.route} {connector.position}")
+    return pairings
+
+
+if __name__ == '__main__':
+    conf = load_config('config.ini')
+    number_connectors(PnID(config=conf), conf)
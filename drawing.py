@@ -1,13 +1,25 @@
-from typing import Optional
+from typing import Callable, Dict, Optional
 
-from utils import is_in_box, get_attributes
+from batch import write
+from records import BlockRefRecord
+from utils import is_in_box
 from point import Point
 
 
 class Drawing:
-    def __init__(self, border):
-        self.border = border
-        self._title_block = None
+    def __init__(self, border, resolver: Callable[[str], object] = None,
+                 on_change: Callable[['Drawing', str], None] = None):
+        """
+        :param border: border blockref
+        :param resolver: function returns COM object of a handle, e.g. CADDoc.resolver
+        :param on_change: called with (drawing, tag) after a title value is written, e.g. PnID drops its sheets
+        """
+        if resolver is None:
+            resolver = border.Document.HandleToObject
+        self.resolver = resolver
+        self.on_change = on_change
+        self.border_handle = border.Handle
+        self._title_block: Optional[BlockRefRecord] = None
         min_point, max_point = border.GetBoundingBox()
         self.min_point = Point(*min_point)
         self.max_point = Point(*max_point)
@@ -17,7 +29,6 @@ class Drawing:
         self._number = None
         self.row = None
         self.items = []
-        self._attrs = {}
 
     @property
     def has_title(self) -> bool:
@@ -34,27 +45,75 @@ class Drawing:
     def __str__(self):
         return str(self._number)
 
+    @property
+    def border(self):
+        """
+        Live border blockref
+        """
+        return self.resolver(self.border_handle)
+
     @property
     def title_block(self):
-        return self._title_block
+        """
+        Live title block
+        """
+        if not self.has_title:
+            return None
+        return self.resolver(self._title_block.handle)
 
     @title_block.setter
     def title_block(self, blockref):
-        self._title_block = blockref
-        self._attrs = get_attributes(blockref)
+        # title block values are read once
+        self._title_block = BlockRefRecord.from_blockref(blockref)
+
+    def refresh(self):
+        """
+        Reload title block values
+        """
+        if self.has_title:
+            self.title_block = self.title_block
+
+    @property
+    def title_values(self) -> Dict[str, str]:
+        if not self.has_title:
+            return {}
+        return dict(self._title_block.attributes)
+
+    def get_title_value(self, tag: str) -> Optional[str]:
+        if not self.has_title:
+            return None
+        return self._title_block.attributes.get(tag)
+
+    def set_title_value(self, tag: str, value: str, batch=None):
+        """
+        :param tag:
+        :param value:
+        :param batch: EditBatch, write later within the batch
+        """
+        if not self.has_title:
+            raise ValueError("No title block in the drawing.")
+        attr = self.resolver(self._title_block.attribute_handles[tag])
+        if batch is None:
+            write(attr, "TextString", value, getattr(self.resolver, 'on_write', None))
+            self._written(tag, value)
+        else:
+            # cached value updated once written
+            batch.set(attr, "TextString", value, lambda *_: self._written(tag, value))
+
+    def _written(self, tag: str, value: str):
+        self._title_block.attributes[tag] = value
+        if self.on_change is not None:
+            self.on_change(self, tag)
 
     @property
     def tag(self) -> Optional[str]:
         if not self.has_title:
             return None
-        return self._attrs["DWG.NO."].TextString
+        return self._title_block.attributes["DWG.NO."]
 
     @tag.setter
     def tag(self, value: str):
-        if self.has_title:
-            self._attrs["DWG.NO."].TextString = value
-        else:
-            raise ValueError("No title block in the drawing.")
+        self.set_title_value("DWG.NO.", value)
 
     @property
     def number(self) -> str:
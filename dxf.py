@@ -1,23 +1,27 @@
 class Entity:
-    def __init__(self, name: str, type_name: str = None):
+    def __init__(self, name: str, type_name: str = None, object_name: str = None):
         # self.type_name = type_name
         self.name = name
         if type_name is None:
             self.type_name = name.upper()
         else:
             self.type_name = type_name
-        self.object_name = f"AcDb{name}"
+        if object_name is None:
+            self.object_name = f"AcDb{name}"
+        else:
+            self.object_name = object_name
         self.interface = f"IAcad{name}"
 
     def __repr__(self):
         return f"<Entity '{self.name}'>"
 
 
-A3DFace = Entity("3DFace")
-A3DPolyline = Entity("3DPolyline")
-A3DSolid = Entity("3DSolid")
+A3DFace = Entity("3DFace", object_name="AcDbFace")
+A3DPolyline = Entity("3DPolyline", object_name="AcDb3dPolyline")
+A3DSolid = Entity("3DSolid", object_name="AcDb3dSolid")
 Arc = Entity("Arc")
 # Attribute = Entity("Attribute", "ATTRIB")
+AttributeRef = Entity("AttributeReference", "ATTRIB", "AcDbAttribute")
 BlockRef = Entity("BlockReference", "INSERT")
 # DimAligned = Entity("DimAligned")
 # DimDiametric = Entity("DimDiametric")
@@ -26,12 +30,13 @@ Circle = Entity("Circle")
 Ellipse = Entity("Ellipse")
 Hatch = Entity("Hatch")
 Leader = Entity("Leader")
-LightweightPolyline = Entity("LWPolyline")
+# ObjectName of lightweight polylines is "AcDbPolyline", of old style 2d polylines "AcDb2dPolyline"
+LightweightPolyline = Entity("LWPolyline", object_name="AcDbPolyline")
 Line = Entity("Line")
-MLine = Entity("MLine")
+MLine = Entity("MLine", object_name="AcDbMline")
 MText = Entity("MText")
 Point = Entity("Point")
-Polyline = Entity("Polyline")
+Polyline = Entity("Polyline", object_name="AcDb2dPolyline")
 Region = Entity("Region")
 Solid = Entity("Solid")
 Spline = Entity("Spline")
@@ -42,3 +47,6 @@ All2DLines = (Line, LightweightPolyline)
 AllDrawingObjects = [A3DFace, A3DPolyline, A3DSolid, Arc, BlockRef, Circle, Ellipse, Hatch, Leader, LightweightPolyline,
                      Line, MLine, MText,
                      Point, Polyline, Region, Solid, Spline, Text]
+
+# for casting objects resolved by handle
+by_object_name = {entity.object_name: entity for entity in AllDrawingObjects + [AttributeRef]}
@@ -1,80 +1,84 @@
-from time import sleep
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
-from win32com.client import CastTo
-
-import constants
 from caddoc import CADDoc
+from drawing import Drawing
+from pnid import PnID
 from point import Point
-from utils import vt_point
-
-
-class Selection:
-    def __init__(self, border, items):
-        self.border = border
-        self.x, self.y, self.z = border.InsertionPoint
-        self.items = items
-
-    def move(self, point1: Point, point2: Point):
-        for item in self.items:
-            item.Move(vt_point(point1), vt_point(point2))
-
 
-def sort_drawings(selections: List[Selection]) -> List[List]:
-    border_width = 841
-    border_height = 594
-    sorted_by_x = sorted(selections, key=lambda sel: sel.x)
-    db = dict()
-    for selection in sorted_by_x:
-        y = selection.y
-        index = round(y / border_height)
-        if index not in db:
-            db[index] = [selection]
-        else:
-            db[index].append(selection)
-    result = [db[key] for key in sorted(db.keys(), reverse=True)]
-    return result
 
-
-def reset_selection_sets(selection_sets):
-    for index in reversed(range(selection_sets.Count)):
-        selection_sets.Item(index).Delete()
-
-
-def align_borders(dwg: CADDoc):
-    distance_x = 900
-    distance_y = 660
-    margin_y = 20
-    start_x = 0
-    start_y = 0
-    border_name = "Border.A1"
-    borders = dwg.get_blockrefs(border_name)
+def plan_layout(drawings: List[Drawing], start: Point = Point(0, 0, 0), gap_x: float = 59,
+                gap_y: float = 66) -> List[Tuple[Drawing, Point]]:
+    """
+    Target position of every drawing, keeping rows of sorted drawings.
+    Cell size comes from the largest drawing plus gaps.
+    :param drawings: sorted drawings with row tagged, as PnID.drawings
+    :param start: target insertion point of the first drawing
+    :param gap_x: horizontal space between drawings
+    :param gap_y: vertical space between rows
+    :return: [(drawing, target insertion point), ...]
+    """
+    distance_x = max(drawing.width for drawing in drawings) + gap_x
+    distance_y = max(drawing.height for drawing in drawings) + gap_y
+    layout = []
+    new_y = start.y
+    new_x = start.x
+    row = None
+    for drawing in drawings:
+        if row is not None and drawing.row != row:
+            new_x = start.x
+            new_y -= distance_y
+        row = drawing.row
+        layout.append((drawing, Point(new_x, new_y, start.z)))
+        new_x += distance_x
+    return layout
+
+
+def sheet_area(drawing: Drawing, margin_y: float = 20) -> Tuple[Point, Point]:
+    """
+    Area of drawing content, including notes below the border
+    """
+    point1 = Point(drawing.min_point.x, drawing.min_point.y - margin_y, 0)
+    point2 = Point(drawing.max_point.x, drawing.max_point.y, 0)
+    return point1, point2
+
+
+def displacement(point1: Point, point2: Point) -> Point:
+    return Point(point2.x - point1.x, point2.y - point1.y, point2.z - point1.z)
+
+
+def locate_entity(pnid: PnID, entity, margin_y: float = 20) -> Optional[Drawing]:
+    """
+    Drawing owning an entity, by the center of its bounding box, notes below the border included
+    """
+    min_point, max_point = entity.GetBoundingBox()
+    center = Point((min_point[0] + max_point[0]) / 2, (min_point[1] + max_point[1]) / 2, 0)
+    drawing = pnid.locate_point(center)
+    if drawing is None:
+        drawing = pnid.locate_point(Point(center.x, center.y + margin_y, 0))
+    return drawing
+
+
+def align_borders(pnid: PnID, start: Point = Point(0, 0, 0), gap_x: float = 59, gap_y: float = 66,
+                  margin_y: float = 20):
+    """
+    Arrange drawings in rows, each drawing moved as one unit.
+    Entities of all drawings are selected before any move, so no target overlaps a drawing not moved yet.
+    """
+    layout = plan_layout(pnid.drawings, start, gap_x, gap_y)
+    pnid.zoom_extents()
     selections = []
-    counter = 1
-    for border in borders:
-        print(f"Preprocessing {counter}/{len(borders)}")
-        # Add delay for processing
-        sleep(0.05)
-        bottom_left, top_right = border.GetBoundingBox()
-        point_btm_left = Point(*bottom_left)
-        point2 = Point(*top_right)
-        point1 = Point(point_btm_left.x, point_btm_left.y - margin_y, point_btm_left.z)
-        entities = dwg.select(constants.acSelectionSetCrossing, point1, point2)
-        selections.append(Selection(border, entities))
-        counter += 1
-    # Sorting
-    sorted_drawings = sort_drawings(selections)
-
-    new_y = start_y
-    for row in sorted_drawings:
-        new_x = start_x
-        for selection in row:
-            point1 = Point(*selection.border.InsertionPoint)
-            point2 = Point(new_x, new_y, 0)
-            print(f"Moving from {point1} to {point2}")
-            selection.move(point1, point2)
-            new_x += distance_x
-        new_y -= distance_y
+    for drawing, target in layout:
+        # crossing selection also catches entities of neighbour sheets, each entity has one owner
+        entities = [entity for entity in pnid.select_entities_in_area(*sheet_area(drawing, margin_y))
+                    if locate_entity(pnid, entity, margin_y) is drawing]
+        selections.append((drawing, target, entities))
+    for counter, (drawing, target, entities) in enumerate(selections, start=1):
+        if (offset := displacement(drawing.position, target)) == Point(0, 0, 0):
+            continue
+        print(f"Moving {counter}/{len(selections)} from {drawing.position} to {target}")
+        pnid.move_entities(entities, offset)
+    pnid.zoom_extents()
+    pnid.reload()
 
 
 def format_pipe_tag(dwg: CADDoc):
@@ -0,0 +1,123 @@
+# Rule-driven tag migration, all changes are computed before writing
+import json
+import re
+from collections import defaultdict
+from typing import Iterable, List, NamedTuple, Tuple
+
+import dxf
+
+
+class Rule(NamedTuple):
+    """
+    Migration rule for one category.
+    With block_names, rule applies on attribute 'tag' of those blockrefs (effective names, wildcards allowed),
+    only when every attribute of conditions fully matches its pattern, e.g. (('FUNCTION', '[A-Z]{2,}'),).
+    Otherwise rule applies on text entities of types in entities.
+    """
+    category: str
+    pattern: str
+    replacement: str
+    block_names: Tuple[str, ...] = ()
+    tag: str = 'TAG'
+    conditions: Tuple[Tuple[str, str], ...] = ()
+    entities: Tuple[dxf.Entity, ...] = (dxf.Text, dxf.MText)
+
+    @property
+    def is_text(self) -> bool:
+        return not self.block_names
+
+
+class Change(NamedTuple):
+    handle: str
+    category: str
+    old: str
+    new: str
+
+
+def _apply_rule(rule: Rule, regex, text: str):
+    if text and (result := regex.sub(rule.replacement, text)) != text:
+        return result
+    return None
+
+
+def plan_changes(doc, rules: Iterable[Rule]) -> List[Tuple[Change, object]]:
+    """
+    Compute all changes without writing
+    :param doc: CADDoc
+    :param rules:
+    :return: [(change, target object), ...]
+    """
+    planned = []
+    block_rules = defaultdict(list)
+    text_rules = []
+    for rule in rules:
+        if rule.is_text:
+            text_rules.append((rule, re.compile(rule.pattern)))
+        else:
+            conditions = [(tag.upper(), re.compile(pattern)) for tag, pattern in rule.conditions]
+            block_rules[rule.block_names].append((rule, re.compile(rule.pattern), conditions))
+
+    for block_names, compiled in block_rules.items():
+        # one selection and one attribute read per blockref for all rules of same blocks
+        for blockref in doc.select_blockrefs_by_names(block_names):
+            attributes = {attr.TagString.upper(): attr for attr in blockref.GetAttributes()}
+            texts = {}
+            for rule, regex, conditions in compiled:
+                tag = rule.tag.upper()
+                if tag not in attributes:
+                    continue
+                if not all(condition in attributes and condition_regex.fullmatch(attributes[condition].TextString)
+                           for condition, condition_regex in conditions):
+                    continue
+                if tag not in texts:
+                    texts[tag] = [attributes[tag].TextString, None, None]
+                old, new, _ = texts[tag]
+                if (result := _apply_rule(rule, regex, old if new is None else new)) is not None:
+                    texts[tag] = [old, result, rule.category]
+            for tag, (old, new, category) in texts.items():
+                if new is not None:
+                    attr = attributes[tag]
+                    planned.append((Change(attr.Handle, category, old, new), attr))
+
+    # one selection per entity type, each rule applied only on its own types
+    for entity in dict.fromkeys(entity for rule, _ in text_rules for entity in rule.entities):
+        compiled = [(rule, regex) for rule, regex in text_rules if entity in rule.entities]
+        for text in doc.select_entities(entity):
+            old = text.TextString
+            new = old
+            category = None
+            for rule, regex in compiled:
+                if (result := _apply_rule(rule, regex, new)) is not None:
+                    new = result
+                    category = rule.category
+            if category:
+                planned.append((Change(text.Handle, category, old, new), text))
+
+    return planned
+
+
+def reverse_changes(changes: Iterable[Change]) -> List[Change]:
+    return [Change(change.handle, change.category, change.new, change.old) for change in reversed(list(changes))]
+
+
+def write_changelog(changes: Iterable[Change], path: str):
+    """
+    Buffered changelog, json lines written at once
+    """
+    lines = [json.dumps(change._asdict(), ensure_ascii=False) for change in changes]
+    with open(path, 'w', encoding='utf8') as file:
+        file.write('\n'.join(lines))
+        if lines:
+            file.write('\n')
+
+
+def read_changelog(path: str) -> List[Change]:
+    with open(path, encoding='utf8') as file:
+        return [Change(**json.loads(line)) for line in file if line.strip()]
+
+
+def summarize(changes: Iterable[Change]) -> dict:
+    summary = defaultdict(int)
+    for change in changes:
+        summary[change.category] += 1
+    return dict(summary)
@@ -0,0 +1,80 @@
+# Spatial ordering of entities for numbering, positions are fetched once
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple
+
+from point import Point
+
+# left to right by columns, top to bottom inside each column
+COLUMNS = 'columns'
+# top to bottom by rows, left to right inside each row
+ROWS = 'rows'
+
+
+class Placed(NamedTuple):
+    handle: str
+    position: Point
+    item: Any
+
+
+def fetch_positions(entities: Iterable) -> List[Placed]:
+    """
+    Read Handle and InsertionPoint once per entity
+    """
+    return [Placed(entity.Handle, Point(*entity.InsertionPoint), entity) for entity in entities]
+
+
+def band(value: float, tolerance: float) -> int:
+    return round(value / tolerance)
+
+
+def group_bands(items: Iterable, position: Callable[[Any], Point], reading_order: str = COLUMNS,
+                tolerance: float = 1) -> List[List]:
+    """
+    Split items into ordered bands (columns or rows), items in each band are ordered too
+    :param items:
+    :param position: function returns position of an item
+    :param reading_order: COLUMNS or ROWS
+    :param tolerance: width of a band, items closer than it are in the same column or row
+    :return: list of bands
+    """
+    bands = defaultdict(list)
+    if reading_order == COLUMNS:
+        for item in items:
+            point = position(item)
+            bands[band(point.x, tolerance)].append((-point.y, item))
+        keys = sorted(bands)
+    elif reading_order == ROWS:
+        for item in items:
+            point = position(item)
+            bands[band(point.y, tolerance)].append((point.x, item))
+        keys = sorted(bands, reverse=True)
+    else:
+        raise ValueError(f"Unknown reading order '{reading_order}'")
+
+    return [[item for _, item in sorted(bands[key], key=lambda pair: pair[0])] for key in keys]
+
+
+def order_items(items: Iterable, position: Callable[[Any], Point], reading_order: str = COLUMNS,
+                tolerance: float = 1) -> List:
+    return [item for items_in_band in group_bands(items, position, reading_order, tolerance)
+            for item in items_in_band]
+
+
+def order_by_sheet(placed: Iterable[Placed], locate: Callable[[Point], Any], reading_order: str = COLUMNS,
+                   tolerance: float = 1) -> Dict[Any, List[str]]:
+    """
+    Group placed entities by drawing, and order them in reading order
+    :param placed: from fetch_positions
+    :param locate: function returns drawing of a point, e.g. PnID.locate_point
+    :param reading_order: COLUMNS or ROWS
+    :param tolerance: band width
+    :return: {drawing: [handle, ...]}, entities out of any drawing are dropped
+    """
+    by_sheet = defaultdict(list)
+    for entry in placed:
+        drawing = locate(entry.position)
+        if drawing is not None:
+            by_sheet[drawing].append(entry)
+
+    return {drawing: [entry.handle for entry in order_items(entries, lambda e: e.position, reading_order, tolerance)]
+            for drawing, entries in by_sheet.items()}
@@ -1,17 +1,21 @@
-from collections import defaultdict
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 
 from caddoc import CADDoc
 from drawing import Drawing
-from components import MainConnector, UtilityConnector, Bubble, Line
+from components import MainConnector, UtilityConnector, Bubble, Line, Valve
+from ordering import COLUMNS, ROWS, group_bands, fetch_positions, order_by_sheet
 from point import Point
+from registry import NameRegistry, BORDER, TITLE_BLOCK, MAIN_CONNECTOR, UTILITY_CONNECTOR, BUBBLE, LINE, VALVE
+from spatial import SheetLocator
+from tracing import tracer
 
 
-def gen_dwg_no(unit: int, seq: int) -> str:
-    return f"{unit:02d}{seq:02d}"
+def gen_dwg_no(unit: int, seq: int, unit_digits: int = 2, seq_digits: int = 2) -> str:
+    return f"{unit:0{unit_digits}d}{seq:0{seq_digits}d}"
 
 
-def tagging_with_unit(drawings: List[Drawing], start_unit: int = 1, start_seq: int = 1):
+def tagging_with_unit(drawings: List[Drawing], start_unit: int = 1, start_seq: int = 1, unit_digits: int = 2,
+                      seq_digits: int = 2):
     unit = start_unit - 1
     seq = start_seq
     index = None
@@ -23,115 +27,245 @@ def tagging_with_unit(drawings: List[Drawing], start_unit: int = 1, start_seq: i
                 index = drawing.row
             else:
                 seq += 1
-            drawing._number = gen_dwg_no(unit, seq)
+            drawing._number = gen_dwg_no(unit, seq, unit_digits, seq_digits)
 
 
 def sorted_drawings(drawings: List[Drawing]):
     min_height = min((h.height for h in drawings))
-    sorted_by_x = sorted(drawings, key=lambda dwg: dwg.position.x)
-    db = defaultdict(list)
-    for drawing in sorted_by_x:
-        y = drawing.position.y
-        index = round(y / min_height)
-        db[index].append(drawing)
-    counter = 1
     result = []
-    for key in sorted(db.keys(), reverse=True):
-        for drawing in db[key]:
+    rows = group_bands(drawings, lambda dwg: dwg.position, reading_order=ROWS, tolerance=min_height)
+    for counter, row in enumerate(rows, start=1):
+        for drawing in row:
             # row tagging
             drawing.row = counter
             result.append(drawing)
-        counter += 1
     return result
 
 
 # todo: outline (mark) target entity for easy searching manually
 class PnID(CADDoc):
-    def __init__(self, filepath: str = None):
-        self.drawings: List[Drawing] = []
-        self.main_connectors: List[MainConnector] = []
-        self.utility_connectors: List[UtilityConnector] = []
-        self.bubbles: List[Bubble] = []
-        self.lines: List[Line] = []
-        super().__init__(filepath=filepath)
+    def __init__(self, filepath: str = None, app=None, registry: NameRegistry = None, config: dict = None,
+                 load_data: bool = True, pool=None):
+        """
+        :param filepath: default is the active document
+        :param app: AutoCAD application, default is the one of the pool
+        :param registry: block name conventions, default is from config
+        :param config: loaded config.ini, for block name conventions when no registry given
+        :param load_data:
+        :param pool: DocumentPool for multi-file work, see pool.py
+        """
+        if registry is None:
+            registry = NameRegistry.from_config(config) if config is not None else NameRegistry()
+        self.registry = registry
+        self._drawings: Optional[List[Drawing]] = None
+        self._main_connectors: Optional[List[MainConnector]] = None
+        self._utility_connectors: Optional[List[UtilityConnector]] = None
+        self._bubbles: Optional[List[Bubble]] = None
+        self._lines: Optional[List[Line]] = None
+        self._locator: Optional[SheetLocator] = None
+        self._sheets: Optional[Dict[str, Drawing]] = None
+        super().__init__(filepath=filepath, load_data=load_data, app=app, pool=pool)
 
     def init_db(self):
+        # every category is loaded on first access
         super().init_db()
-        self.load_drawings()
-        self.load_connectors()
-        self.load_bubbles()
-        self.load_lines()
+        self._drawings = None
+        self._main_connectors = None
+        self._utility_connectors = None
+        self._bubbles = None
+        self._lines = None
+        self._locator = None
+        self._sheets = None
+
+    def init_components(self):
+        """
+        Drop loaded components after their attributes were rewritten, drawings are kept
+        """
+        self._main_connectors = None
+        self._utility_connectors = None
+        self._bubbles = None
+        self._lines = None
+        self._sheets = None
+
+    @property
+    def drawings(self) -> List[Drawing]:
+        if self._drawings is None:
+            self.load_drawings()
+        return self._drawings
+
+    @property
+    def locator(self) -> SheetLocator:
+        if self._locator is None:
+            self.load_drawings()
+        return self._locator
+
+    @property
+    def sheets(self) -> Dict[str, Drawing]:
+        """
+        Drawings with title block, by drawing number
+        """
+        if self._sheets is None:
+            self._sheets = {drawing.tag: drawing for drawing in self.drawings if drawing.has_title}
+        return self._sheets
+
+    def get_drawing(self, number: str) -> Optional[Drawing]:
+        return self.sheets.get(number)
+
+    def renumber_drawings(self, mapping: Dict[str, str]) -> int:
+        """
+        Write new drawing numbers to title blocks in one batch
+        :param mapping: {old number: new number}
+        :return: number of renumbered drawings
+        """
+        batch = self.new_batch()
+        counter = 0
+        for old, new in mapping.items():
+            drawing = self.sheets.get(old)
+            if drawing is not None and old != new:
+                drawing.set_title_value("DWG.NO.", new, batch)
+                counter += 1
+        batch.commit()
+        return counter
+
+    def _title_changed(self, drawing: Drawing, tag: str):
+        # sheets are keyed by drawing number
+        if tag == "DWG.NO.":
+            self._sheets = None
+
+    @property
+    def main_connectors(self) -> List[MainConnector]:
+        if self._main_connectors is None:
+            self.load_connectors()
+        return self._main_connectors
+
+    @property
+    def utility_connectors(self) -> List[UtilityConnector]:
+        if self._utility_connectors is None:
+            self.load_connectors()
+        return self._utility_connectors
+
+    @property
+    def bubbles(self) -> List[Bubble]:
+        if self._bubbles is None:
+            self.load_bubbles()
+        return self._bubbles
+
+    @property
+    def lines(self) -> List[Line]:
+        if self._lines is None:
+            self.load_lines()
+        return self._lines
+
+    def find_category(self, category: str) -> List:
+        """
+        Blockrefs of a name category, by cached classification when indexed, otherwise by a targeted selection
+        """
+        if self.is_indexed:
+            result = []
+            for name in self.registry.names_of(category, self.blockrefs):
+                result.extend(self.blockrefs[name])
+            return result
+        return self.select_blockrefs_by_names(self.registry.wildcards(category))
+
+    def load_components(self):
+        """
+        Index the document, then wrap components of every category in one pass
+        """
+        print("Loading components")
+        with tracer.span("load_components") as span:
+            groups = self.registry.group(self.blockrefs)
+            loaded = {}
+            for category, blockrefs in groups.items():
+                if (wrapper := self.registry.wrapper(category)) is not None:
+                    loaded[category] = self.wrap_blockrefs(blockrefs, wrapper)
+            self._main_connectors = loaded.get(MAIN_CONNECTOR, [])
+            self._utility_connectors = loaded.get(UTILITY_CONNECTOR, [])
+            self._bubbles = loaded.get(BUBBLE, [])
+            self._lines = loaded.get(LINE, [])
+            span.count(**{category: len(components) for category, components in loaded.items()})
+        return loaded
 
     def get_title_blocks(self):
-        return self.search_blockrefs("^TitleBlock.*")
+        return self.find_category(TITLE_BLOCK)
 
     def get_borders(self):
-        return self.search_blockrefs("^Border.*")
+        return self.find_category(BORDER)
 
     def load_drawings(self):
         print("Loading drawings")
-        borders = self.get_borders()
-        title_blocks = self.get_title_blocks()
-        drawings = []
-        for border in borders:
-            drawing = Drawing(border)
-            drawings.append(drawing)
-            for title_block in title_blocks[:]:
-                if Point(*title_block.InsertionPoint) in drawing:
+        with tracer.span("load_drawings") as span:
+            drawings = [Drawing(border, self.resolver, self._title_changed) for border in self.get_borders()]
+            locator = SheetLocator(drawings)
+            for title_block in self.get_title_blocks():
+                drawing = locator.locate(Point(*title_block.InsertionPoint))
+                if drawing is not None and not drawing.has_title:
                     drawing.title_block = title_block
-                    title_blocks.remove(title_block)
-                    break
 
-        self.drawings = drawings
-        self.sort_drawings()
+            self._drawings = sorted_drawings(drawings) if drawings else drawings
+            self._locator = locator
+            span.count(drawings=len(drawings))
 
     def sort_drawings(self):
-        self.drawings = sorted_drawings(self.drawings)
+        self._drawings = sorted_drawings(self.drawings)
 
     def load_connectors(self):
         print("Loading connectors")
-        self.main_connectors = self.get_main_connectors()
-        print(f"{len(self.main_connectors)} main connectors.")
-        self.utility_connectors = self.get_utility_connectors()
-        print(f"{len(self.utility_connectors)} utility connectors.")
+        with tracer.span("load_connectors") as span:
+            self._main_connectors = self.get_main_connectors()
+            print(f"{len(self._main_connectors)} main connectors.")
+            self._utility_connectors = self.get_utility_connectors()
+            print(f"{len(self._utility_connectors)} utility connectors.")
+            span.count(main_connectors=len(self._main_connectors), utility_connectors=len(self._utility_connectors))
 
     def get_main_connectors(self):
-        return self.wrap_blockrefs(self.blockrefs.get('Connector_Main', []), MainConnector)
+        return self.wrap_blockrefs(self.find_category(MAIN_CONNECTOR), self.registry.wrapper(MAIN_CONNECTOR))
 
     def get_utility_connectors(self):
-        return self.wrap_blockrefs(self.blockrefs.get('Connector_Utility', []), UtilityConnector)
+        return self.wrap_blockrefs(self.find_category(UTILITY_CONNECTOR), self.registry.wrapper(UTILITY_CONNECTOR))
 
     def load_bubbles(self):
         print('Loading bubbles')
-        self.bubbles = self.get_bubbles()
-        print(f'{len(self.bubbles)} bubbles.')
+        with tracer.span("load_bubbles") as span:
+            self._bubbles = self.get_bubbles()
+            span.count(bubbles=len(self._bubbles))
+        print(f'{len(self._bubbles)} bubbles.')
 
     def get_bubbles(self) -> List[Bubble]:
-        bubbles = self.search_blockrefs(r'\w+_(LOCAL|FRONT|BACK)')
-        return self.wrap_blockrefs(bubbles, Bubble)
+        return self.wrap_blockrefs(self.find_category(BUBBLE), self.registry.wrapper(BUBBLE))
 
     def load_lines(self):
         print('Loading Lines')
-        self.lines = self.get_lines()
-        print(f'{len(self.lines)} lines.')
+        with tracer.span("load_lines") as span:
+            self._lines = self.get_lines()
+            span.count(lines=len(self._lines))
+        print(f'{len(self._lines)} lines.')
 
     def get_lines(self) -> List[Line]:
-        lines = self.blockrefs.get('pipe_tag', []) + self.blockrefs.get('TAG_NUMBER', [])
-        return self.wrap_blockrefs(lines, Line)
+        return self.wrap_blockrefs(self.find_category(LINE), self.registry.wrapper(LINE))
+
+    def get_valves(self) -> List[Valve]:
+        return self.wrap_blockrefs(self.find_category(VALVE), self.registry.wrapper(VALVE))
 
     def wrap_blockrefs(self, blockrefs: List, wrapper):
         return [self.wrap_blockref(blockref, wrapper) for blockref in blockrefs]
 
     def wrap_blockref(self, blockref, wrapper):
-        target = wrapper(blockref)
-        target.drawing = self.locate(blockref)
+        target = wrapper(blockref, self.resolver, self.effective_name(blockref))
+        target.drawing = self.locate_point(target.position)
         return target
 
     def locate(self, blockref) -> Optional[Drawing]:
-        for drawing in self.drawings:
-            if Point(*blockref.InsertionPoint) in drawing:
-                return drawing
-        return None
+        return self.locate_point(Point(*blockref.InsertionPoint))
+
+    def locate_point(self, point: Point) -> Optional[Drawing]:
+        return self.locator.locate(point)
+
+    def order_by_sheet(self, entities: Iterable, reading_order: str = COLUMNS,
+                       tolerance: float = 1) -> Dict[Drawing, List[str]]:
+        """
+        Ordered handles of entities in each drawing, for numbering
+        """
+        return order_by_sheet(fetch_positions(entities), self.locate_point, reading_order, tolerance)
 
 
 def gen_loops(instruments):
@@ -1,61 +1,22 @@
 # -*- coding: utf-8 -*-
 import re
-from win32com.client.gencache import EnsureDispatch
-from win32com.client import CastTo
-from pathlib import Path
-import time
-import pprint
-import logging
-
-logger = logging.getLogger('pnid')
-logger.setLevel(logging.INFO)
-log_handler = logging.StreamHandler()
-file_handler = logging.FileHandler(Path('change.log'), encoding='utf8')
-logger.addHandler(log_handler)
-logger.addHandler(file_handler)
-
-
-def get_application(version='', visible=True):
-    """
-    AutoCAD Application COM Object
-
-    :param version:
-        default is latest version
-        '16' for version 2006
-    :param visible:
-        default is True
-    :return:
-        AutoCAD Application Object
-    """
-    prog_id = 'AutoCAD.Application'
-    if version:
-        prog_id = '.'.join((prog_id, version))
-    app = EnsureDispatch(prog_id)
-    app.Visible = visible
-    return app
-
-
-def get_document(app, filename):
-    for document in app.Documents:
-        if Path(document.FullName) == Path(filename):
-            return document
-
-    return app.Documents.Open(filename)
-
-
-def get_attributes(block):
-    """
-    Wrapper of Block.GetAttributes
-    Usage: attrs = get_attributes(blockRef)
-           attrs['TAG'].TextString = 'hello'
-    :param block: BlockReference
-    :return Dict contends AcadAttributeReference objects
-    """
-    attributes = dict()
-    for attribute in block.GetAttributes():
-        attributes[attribute.TagString.upper()] = attribute
-
-    return attributes
+
+import dxf
+from caddoc import CADDoc
+from migration import Rule
+from tracing import tracer
+
+# Prefix unit with "0", e.g. NG1010-50-B2RF1 -> NG01010-50-B2RF1
+UNIT_PREFIX_RULES = [
+    Rule('Pipe', r'^([A-Z]+)(\d)(\d+-(?:\d*|DN)-\w*-*[A-Z]*)$', r'\g<1>0\g<2>\g<3>', ('PIPE_TAG',)),
+    Rule('Instrument', r'^(\d)(\d+.*)$', r'0\g<1>\g<2>', ('DI_LOCAL', 'SH_PRI_FRONT', 'SC_LOCAL'),
+         conditions=(('FUNCTION', r'[A-Z][A-Z]+'),)),
+    Rule('Inline', r'^([A-Z]+-)(\d)(\d+[A-Z]*)$', r'\g<1>0\g<2>\g<3>', ('STRAINER*',)),
+    Rule('Connector', r'^(\d)(\d+)$', r'0\g<1>\g<2>', ('CONNECTOR_MAIN', 'CONNECTOR_UTILITY')),
+    Rule('Connector', r'^((?:FROM|TO).*?)(?<!\d)(\d{5})(?!\d)', r'\g<1>0\g<2>', ('CONNECTOR_MAIN', 'CONNECTOR_UTILITY'),
+         'ORIGINORDESTINATION'),
+    Rule('Text', r'-(\d{5})(?!\d)', r'-0\g<1>', entities=(dxf.Text,)),
+]
 
 
 # for qualified name
@@ -308,115 +269,6 @@ class Connector:
         return self._unit + self._sequence
 
 
-class PnID:
-    def __init__(self, file_path):
-        self.app = get_application(version='16')
-        self.doc = get_document(self.app, file_path)
-        if self.doc:
-            self._renumber()
-
-    def _renumber(self):
-        self.pipes = []
-        self.instruments = []
-        self.inlines = []
-        self.connectors = []
-        self.text_counter = 0
-        counter = 0
-        self.error_pipes = []
-        self.error_instruments = []
-
-        for item in self.doc.ModelSpace:
-            if item.ObjectName == 'AcDbBlockReference':
-                block_ref = CastTo(item, 'IAcadBlockReference2')
-                block_name = block_ref.EffectiveName.upper()
-                # For pipe
-                if block_name == 'PIPE_TAG':
-                    self._process_pipe(get_attributes(block_ref))
-                    continue
-                # For Inst Bubble
-                if block_name in ('DI_LOCAL', 'SH_PRI_FRONT', 'SC_LOCAL'):
-                    self._process_inst(get_attributes(block_ref))
-                    continue
-                # For Strainer
-                if block_name.startswith('STRAINER'):
-                    self._process_inline(get_attributes(block_ref))
-                    continue
-                # For Connector
-                if block_name in ('CONNECTOR_MAIN', 'CONNECTOR_UTILITY'):
-                    self._process_connector(get_attributes(block_ref))
-                    continue
-            elif item.ObjectName == 'AcDbText':
-                text = CastTo(item, 'IAcadText')
-                match = re.fullmatch(r'.*-(\d{5}).*', text.TextString)
-                if match:
-                    old_tag = match.group(1)
-                    new_tag = '0' + old_tag
-                    logger.info('Text: %s -> %s' % (text.TextString, new_tag))
-                    self.text_counter += 1
-                    text.TextString = text.TextString.replace(old_tag, new_tag)
-
-    def _process_pipe(self, attributes):
-        attr = attributes['TAG']
-        try:
-            pipe = Pipe(attr.TextString)
-            self.pipes.append(pipe)
-            tag_change(pipe)
-            attr.TextString = pipe.tag
-        except ValueError:
-            self.error_pipes.append(attr.TextString)
-
-    def _process_inst(self, attributes):
-        function_letters = attributes['FUNCTION'].TextString
-        loop_tag = attributes['TAG'].TextString
-        try:
-            instrument = Instrument(function_letters, loop_tag)
-            self.instruments.append(instrument)
-            tag_change(instrument)
-            attributes['TAG'].TextString = instrument.loop_tag
-            # attributes['TAG'].ScaleFactor = 0.6
-        except ValueError:
-            self.error_instruments.append('%s-%s' % (function_letters, loop_tag))
-
-    def _process_inline(self, attributes):
-        attr = attributes['TAG']
-        try:
-            inline = Inline(attr.TextString)
-            self.inlines.append(inline)
-            tag_change(inline)
-            attr.TextString = inline.tag
-        except ValueError:
-            # self.error_pipes.append(attr.TextString)
-            pass
-
-    def _process_connector(self, attributes):
-        attr = attributes['TAG']
-        try:
-            connector = Connector(attr.TextString)
-            self.connectors.append(connector)
-            tag_change(connector)
-            attr.TextString = connector.tag
-            # attr.ScaleFactor = 0.7
-            if 'ORIGINORDESTINATION' in attributes:
-                from_to = attributes['ORIGINORDESTINATION']
-                match = re.fullmatch(r'(FROM|TO).*(\d{1})(\d{4}).*', from_to.TextString)
-                if match:
-                    temp_str, unit, seq = match.groups()
-                    old_number = '%s%s' % (unit, seq)
-                    new_number = '0%s%s' % (unit, seq)
-                    logger.info('%s -> %s' % (from_to.TextString, new_number))
-                    from_to.TextString = from_to.TextString.replace(old_number, new_number)
-
-        except ValueError:
-            pass
-
-
-def tag_change(element):
-    origin_name = element.tag
-    element.unit = '0' + element.unit
-    new_name = element.tag
-    logger.info('%s: %s -> %s' % (element.category, origin_name, new_name))
-
-
 def gen_loops(instruments):
     loops = dict()
     for instrument in instruments:
@@ -448,15 +300,12 @@ def gen_bones(items, keyword_attribute):
 
 
 if __name__ == '__main__':
-    # line = Line('NG01010-50-B2SRF1-H')
-    # print(line)
-    pp = pprint.PrettyPrinter()
-    start_time = time.time()
+    tracer.enable()
     target_file = r'D:\Work\Project\XY2019P02-KAYAN.25MMSCFD.LNG\PnID\Loading\KAYAN.25.Loading.PnID_2019.1226.dwg'
-    logger.info('Start with "%s"' % target_file)
-    pnid = PnID(target_file)
-    end_time = time.time()
-    time_spent = end_time - start_time
-    print('Time spent: %.2fs' % time_spent)
-
-    logger.info('%s Pipes, %s Instruments, %s Inlines, %s Connectors, %s Texts' % (len(pnid.pipes), len(pnid.instruments), len(pnid.inlines), len(pnid.connectors), pnid.text_counter))
+    print('Start with "%s"' % target_file)
+    with tracer.span('pnid_tag_upper') as span:
+        doc = CADDoc(target_file, load_data=False)
+        changes = doc.migrate_tags(UNIT_PREFIX_RULES, 'change.log')
+        span.count(changes=len(changes))
+    print('Time spent: %.2fs' % span.wall)
+    tracer.dump('pnid_tag_upper.trace.json')
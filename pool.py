@@ -0,0 +1,88 @@
+# Pool of open documents for multi-file work, least recently used ones are closed
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from caddoc import EvictedDocument, get_acad_app, normalize_path
+
+
+class DocumentPool:
+    def __init__(self, app=None, max_open: int = 8, save_on_evict: bool = True):
+        """
+        :param app: AutoCAD application, default is a running instance
+        :param max_open: max number of documents opened by the pool
+        :param save_on_evict: save or discard changes when closing a document
+        """
+        self.app = app if app is not None else get_acad_app()
+        self.max_open = max_open
+        self.save_on_evict = save_on_evict
+        # documents opened by the pool, in order of use
+        self._documents = OrderedDict()
+        # documents not opened by the pool, never closed by it, found on first request
+        self._external = {}
+        self._owners = {}
+        self._indexes: Dict[str, Dict[str, List[str]]] = {}
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __contains__(self, filepath: str):
+        key = normalize_path(filepath)
+        return key in self._documents or self._find_external(key) is not None
+
+    def _find_external(self, key: str):
+        """
+        Document open in AutoCAD but not by the pool, e.g. opened by the user, looked up only when not known yet
+        """
+        if key in self._external:
+            return self._external[key]
+        for document in self.app.Documents:
+            if normalize_path(document.FullName) == key:
+                self._external[key] = document
+                return document
+        return None
+
+    def get(self, filepath: str, owner=None):
+        """
+        Opened document of the path, open it if needed
+        :param filepath:
+        :param owner: CADDoc using the document, its index is kept when the document is evicted
+        """
+        key = normalize_path(filepath)
+        if owner is not None:
+            self._owners[key] = owner
+        if key in self._documents:
+            self._documents.move_to_end(key)
+            return self._documents[key]
+        if (document := self._find_external(key)) is not None:
+            return document
+        document = self.app.Documents.Open(filepath)
+        self._documents[key] = document
+        while len(self._documents) > self.max_open:
+            self.evict(next(iter(self._documents)))
+        return document
+
+    def evict(self, key: str):
+        document = self._documents.pop(key)
+        owner = self._owners.pop(key, None)
+        # handles stay valid only if the document on disk matches the session
+        if owner is not None and (self.save_on_evict or document.Saved):
+            if (index := owner.export_index()) is not None:
+                self._indexes[key] = index
+        name = document.Name
+        print(f"Closing {name}")
+        document.Close(self.save_on_evict)
+        if owner is not None:
+            owner.doc = EvictedDocument(name)
+            owner.resolver.clear()
+            owner.resolver.doc = owner.doc
+            owner.init_db()
+
+    def get_index(self, filepath: str) -> Optional[Dict[str, List[str]]]:
+        """
+        Blockref index as handles, kept from last eviction
+        """
+        return self._indexes.get(normalize_path(filepath))
+
+    def close_all(self):
+        for key in list(self._documents):
+            self.evict(key)
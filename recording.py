@@ -0,0 +1,250 @@
+# Record COM sessions of a real run, replay them without AutoCAD
+# Record: recorder = Recorder()
+#         pnid = PnID(app=recorder.wrap(get_acad_app()))
+#         ...
+#         recorder.save('session.rec.gz')
+# Replay: pnid = PnID(app=Replayer('session.rec.gz', latency=0.001).app)
+import gzip
+import json
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Tuple
+
+from utils import cast_to, com_error
+
+_FORMAT_VERSION = 1
+_ROOT_ID = 0
+
+
+class ReplayError(Exception):
+    pass
+
+
+def _is_com_object(value) -> bool:
+    return hasattr(value, '_oleobj_')
+
+
+class Recorder:
+    def __init__(self):
+        # [obj_id, op, name, args, result, duration]
+        self.events: List[list] = []
+        self._next_id = _ROOT_ID
+
+    def wrap(self, obj) -> 'RecordingProxy':
+        proxy = RecordingProxy(self, obj, self._next_id)
+        self._next_id += 1
+        return proxy
+
+    def capture(self, value) -> Tuple[Any, Any]:
+        """
+        :return: (json encoded value, value with COM objects wrapped in proxies)
+        """
+        if isinstance(value, RecordingProxy):
+            return {'$ref': value._id}, value
+        if _is_com_object(value):
+            proxy = self.wrap(value)
+            return {'$ref': proxy._id}, proxy
+        if isinstance(value, (list, tuple)):
+            pairs = [self.capture(item) for item in value]
+            return [encoded for encoded, _ in pairs], type(value)(wrapped for _, wrapped in pairs)
+        if isinstance(value, (str, int, float, bool)) or value is None:
+            return value, value
+        # VARIANT arguments
+        if hasattr(value, 'value'):
+            return self.capture(value.value)[0], value
+        return str(value), value
+
+    def record(self, obj_id: int, op: str, name: str, args, result, duration: float):
+        self.events.append([obj_id, op, name, args, result, round(duration, 6)])
+
+    def save(self, path: str):
+        with gzip.open(path, 'wt', encoding='utf8') as file:
+            file.write(json.dumps({'version': _FORMAT_VERSION, 'events': len(self.events)}))
+            file.write('\n')
+            for event in self.events:
+                file.write(json.dumps(event, ensure_ascii=False, separators=(',', ':')))
+                file.write('\n')
+
+
+def _unwrap(value):
+    if isinstance(value, RecordingProxy):
+        return value._obj
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(item) for item in value)
+    return value
+
+
+class RecordingProxy:
+    """
+    Forward everything to the COM object, and record what is returned
+    """
+    __slots__ = ('_recorder', '_obj', '_id')
+
+    def __init__(self, recorder: Recorder, obj, obj_id: int):
+        object.__setattr__(self, '_recorder', recorder)
+        object.__setattr__(self, '_obj', obj)
+        object.__setattr__(self, '_id', obj_id)
+
+    def _run(self, op: str, name: str, args, func, methods: bool = False):
+        """
+        Call func, timed and recorded
+        :param methods: a returned python callable is a method, recorded when it is called
+        """
+        recorder = self._recorder
+        encoded_args, _ = recorder.capture(args)
+        start = time.perf_counter()
+        try:
+            raw = func()
+        except Exception as err:
+            recorder.record(self._id, op, name, encoded_args, {'$error': str(err)}, time.perf_counter() - start)
+            raise
+        if methods and callable(raw) and not _is_com_object(raw):
+            return _RecordingMethod(self, name, raw)
+        duration = time.perf_counter() - start
+        encoded, wrapped = recorder.capture(raw)
+        recorder.record(self._id, op, name, encoded_args, encoded, duration)
+        return wrapped
+
+    def __getattr__(self, name: str):
+        obj = object.__getattribute__(self, '_obj')
+        return self._run('get', name, [], lambda: getattr(obj, name), methods=True)
+
+    def __setattr__(self, name: str, value):
+        self._run('set', name, [value], lambda: setattr(self._obj, name, _unwrap(value)))
+
+    def __iter__(self):
+        return iter(self._run('iter', '', [], lambda: list(self._obj)))
+
+    def _key(self):
+        # proxies of the same COM object are equal, compared by its IDispatch
+        obj = self._obj
+        return getattr(obj, '_oleobj_', obj)
+
+    def __eq__(self, other):
+        other = _unwrap(other)
+        return self._key() == getattr(other, '_oleobj_', other)
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"<RecordingProxy #{self._id}>"
+
+    def _cast(self, interface: str):
+        return self._run('cast', interface, [], lambda: cast_to(self._obj, interface))
+
+
+class _RecordingMethod:
+    def __init__(self, proxy: RecordingProxy, name: str, method):
+        self.proxy = proxy
+        self.name = name
+        self.method = method
+
+    def __call__(self, *args):
+        return self.proxy._run('call', self.name, list(args), lambda: self.method(*_unwrap(args)))
+
+
+class Replayer:
+    """
+    Serve recorded responses by (object, operation, name, arguments).
+    Repeated requests get recorded responses in order, the last one is reused when exhausted.
+    """
+    def __init__(self, path: str, latency: float = 0, scale: float = 0):
+        """
+        :param path: recorded session
+        :param latency: synthetic latency added to every call, in seconds
+        :param scale: recorded duration multiplier added to every call, 1 for real speed
+        """
+        self.latency = latency
+        self.scale = scale
+        self._responses: Dict[tuple, deque] = defaultdict(deque)
+        self._last: Dict[tuple, list] = {}
+        self._methods = set()
+        self._proxies: Dict[int, ReplayProxy] = {}
+        with gzip.open(path, 'rt', encoding='utf8') as file:
+            header = json.loads(file.readline())
+            if header.get('version') != _FORMAT_VERSION:
+                raise ReplayError(f"Unsupported session format: {header}")
+            for line in file:
+                obj_id, op, name, args, result, duration = json.loads(line)
+                self._responses[self._key(obj_id, op, name, args)].append((result, duration))
+                if op == 'call':
+                    self._methods.add((obj_id, name))
+
+    @property
+    def app(self) -> 'ReplayProxy':
+        return self.proxy(_ROOT_ID)
+
+    def proxy(self, obj_id: int) -> 'ReplayProxy':
+        if obj_id not in self._proxies:
+            self._proxies[obj_id] = ReplayProxy(self, obj_id)
+        return self._proxies[obj_id]
+
+    @staticmethod
+    def _key(obj_id: int, op: str, name: str, args) -> tuple:
+        return obj_id, op, name, json.dumps(args, ensure_ascii=False, separators=(',', ':'))
+
+    def encode(self, value):
+        if isinstance(value, ReplayProxy):
+            return {'$ref': value._id}
+        if isinstance(value, (list, tuple)):
+            return [self.encode(item) for item in value]
+        if hasattr(value, 'value') and not isinstance(value, (str, int, float, bool)):
+            return self.encode(value.value)
+        return value
+
+    def decode(self, value):
+        if isinstance(value, dict):
+            if '$ref' in value:
+                return self.proxy(value['$ref'])
+            if '$error' in value:
+                # recorded COM error raised again
+                raise com_error(value['$error'])
+        if isinstance(value, list):
+            # COM returns tuples
+            return tuple(self.decode(item) for item in value)
+        return value
+
+    def is_method(self, obj_id: int, name: str) -> bool:
+        return (obj_id, name) in self._methods
+
+    def respond(self, obj_id: int, op: str, name: str, args: List[Any]):
+        key = self._key(obj_id, op, name, self.encode(args))
+        queue = self._responses.get(key)
+        if queue:
+            response = queue.popleft()
+            self._last[key] = response
+        elif key in self._last:
+            response = self._last[key]
+        else:
+            raise ReplayError(f"No recorded response for {key}")
+        result, duration = response
+        delay = self.latency + duration * self.scale
+        if delay:
+            time.sleep(delay)
+        return self.decode(result)
+
+
+class ReplayProxy:
+    __slots__ = ('_replayer', '_id')
+
+    def __init__(self, replayer: Replayer, obj_id: int):
+        object.__setattr__(self, '_replayer', replayer)
+        object.__setattr__(self, '_id', obj_id)
+
+    def __getattr__(self, name: str):
+        if self._replayer.is_method(self._id, name):
+            return lambda *args: self._replayer.respond(self._id, 'call', name, list(args))
+        return self._replayer.respond(self._id, 'get', name, [])
+
+    def __setattr__(self, name: str, value):
+        self._replayer.respond(self._id, 'set', name, [value])
+
+    def __iter__(self):
+        return iter(self._replayer.respond(self._id, 'iter', '', []))
+
+    def __repr__(self):
+        return f"<ReplayProxy #{self._id}>"
+
+    def _cast(self, interface: str):
+        return self._replayer.respond(self._id, 'cast', interface, [])
@@ -0,0 +1,38 @@
+# Compact value records of entities, instead of holding live COM objects.
+# COM objects are re-resolved by handle only when writing.
+from typing import Dict, Optional
+
+from point import Point
+
+
+class BlockRefRecord:
+    __slots__ = ('handle', 'name', 'position', 'attributes', 'attribute_handles', 'properties')
+
+    def __init__(self, handle: str, name: str, position: Point, attributes: Dict[str, str],
+                 attribute_handles: Dict[str, str], properties: Dict[str, object]):
+        self.handle = handle
+        self.name = name
+        self.position = position
+        self.attributes = attributes
+        self.attribute_handles = attribute_handles
+        self.properties = properties
+
+    def __repr__(self):
+        return f"<BlockRefRecord {self.handle} '{self.name}'>"
+
+    @classmethod
+    def from_blockref(cls, blockref, name: Optional[str] = None) -> 'BlockRefRecord':
+        """
+        Read everything once
+        :param blockref:
+        :param name: effective name if already known
+        """
+        attributes = {}
+        attribute_handles = {}
+        for attr in blockref.GetAttributes():
+            tag = attr.TagString
+            attributes[tag] = attr.TextString
+            attribute_handles[tag] = attr.Handle
+        properties = {prop.PropertyName: prop.Value for prop in blockref.GetDynamicBlockProperties()}
+        return cls(blockref.Handle, name or blockref.EffectiveName, Point(*blockref.InsertionPoint), attributes,
+                   attribute_handles, properties)
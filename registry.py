@@ -0,0 +1,101 @@
+# Block name conventions: effective name -> category -> component class.
+# Each distinct effective name is classified once.
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from components import Bubble, Line, MainConnector, UtilityConnector, Valve
+
+BORDER = 'border'
+TITLE_BLOCK = 'title_block'
+MAIN_CONNECTOR = 'main_connector'
+UTILITY_CONNECTOR = 'utility_connector'
+BUBBLE = 'bubble'
+LINE = 'line'
+VALVE = 'valve'
+STRAINER = 'strainer'
+
+
+class Category(NamedTuple):
+    name: str
+    # regex matched from the start of effective names
+    pattern: str
+    # names for filtered selection, wildcards allowed
+    wildcards: Tuple[str, ...]
+    # component class, raw blockrefs if None
+    wrapper: Optional[type] = None
+
+
+DEFAULT_CATEGORIES = (
+    Category(BORDER, r'^Border.*', ('Border*',)),
+    Category(TITLE_BLOCK, r'^TitleBlock.*', ('TitleBlock*',)),
+    Category(MAIN_CONNECTOR, r'^Connector_Main$', ('Connector_Main',), MainConnector),
+    Category(UTILITY_CONNECTOR, r'^Connector_Utility$', ('Connector_Utility',), UtilityConnector),
+    Category(LINE, r'^(pipe_tag|TAG_NUMBER)$', ('pipe_tag', 'TAG_NUMBER'), Line),
+    Category(VALVE, Valve.name_pattern, ('VALVE_*',), Valve),
+    Category(STRAINER, r'STRAINER_.*', ('STRAINER_*',)),
+    # generic pattern, after specific categories, e.g. VALVE_*_LOCAL stays a valve
+    Category(BUBBLE, r'\w+_(LOCAL|FRONT|BACK)', ('*_LOCAL*', '*_FRONT*', '*_BACK*'), Bubble),
+)
+
+
+class NameRegistry:
+    """
+    Classify effective names by category patterns, first matched category wins.
+    Usage: registry = NameRegistry.from_config(load_config('config.ini'))
+           registry.classify('Connector_Main') -> 'main_connector'
+    """
+    def __init__(self, categories: Iterable[Category] = DEFAULT_CATEGORIES):
+        self.categories: Dict[str, Category] = {category.name: category for category in categories}
+        self._regexes = [(name, re.compile(category.pattern)) for name, category in self.categories.items()]
+        self._cache: Dict[str, Optional[str]] = {}
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'NameRegistry':
+        """
+        Default categories with project conventions, see [name_patterns] and [name_selections] of config.ini.
+        New categories are appended, after default ones.
+        """
+        categories = {category.name: category for category in DEFAULT_CATEGORIES}
+        for name, convention in config.get('names', {}).items():
+            if name not in categories and not convention.get('pattern'):
+                raise ValueError(f"No name pattern for category '{name}', see [name_patterns] of config.ini")
+            category = categories.get(name, Category(name, '', ()))
+            if 'pattern' in convention:
+                category = category._replace(pattern=convention['pattern'])
+            if 'wildcards' in convention:
+                category = category._replace(wildcards=tuple(convention['wildcards']))
+            categories[name] = category
+        return cls(categories.values())
+
+    def classify(self, name: str) -> Optional[str]:
+        try:
+            return self._cache[name]
+        except KeyError:
+            pass
+        category = None
+        for category_name, regex in self._regexes:
+            if regex.match(name):
+                category = category_name
+                break
+        self._cache[name] = category
+        return category
+
+    def names_of(self, category: str, names: Iterable[str]) -> List[str]:
+        return [name for name in names if self.classify(name) == category]
+
+    def wrapper(self, category: str) -> Optional[type]:
+        return self.categories[category].wrapper
+
+    def wildcards(self, category: str) -> Tuple[str, ...]:
+        return self.categories[category].wildcards
+
+    def group(self, index: Dict[str, list]) -> Dict[str, list]:
+        """
+        Blockrefs by category, in one pass over a blockref index
+        :param index: {effective name: [blockref]}, e.g. CADDoc.blockrefs
+        """
+        groups = {name: [] for name in self.categories}
+        for name, blockrefs in index.items():
+            if (category := self.classify(name)) is not None:
+                groups[category].extend(blockrefs)
+        return groups
@@ -0,0 +1,115 @@
+# Cascading sheet renumbering: title blocks, connector references and texts in one batch.
+# Usage: mapping = number_map(pnid, config)
+#        changes = renumber_sheets(pnid, mapping, config, 'renumber.log')
+#        pnid.apply_changes(reverse_changes(read_changelog('renumber.log')))  # undo
+import re
+from typing import Dict, Iterable, List, Optional
+
+from config import load_config
+from drawing import Drawing
+from migration import Change, summarize, write_changelog
+from pnid import PnID, tagging_with_unit
+from tracing import tracer
+
+TITLE = 'Title'
+CONNECTOR = 'Connector'
+TEXT = 'Text'
+
+
+def number_map(pnid: PnID, config: dict, drawings: Iterable[Drawing] = None) -> Dict[str, str]:
+    """
+    Old to new sheet numbers by layout order, see tagging_with_unit.
+    Drawing.number of the given drawings is set to the new number, drawings of pnid.drawings are modified.
+    :param drawings: default is titled drawings from the start unit, legend and unnumbered sheets excluded
+    """
+    digits = config["drawing"]["number_digits"]
+    unit_digits = config["drawing"]["unit_digits"]
+    start_unit = config["drawing"]["start_unit"]
+    prefix = config["drawing"]["number_prefix"]
+    if drawings is None:
+        drawings = [drawing for drawing in pnid.drawings
+                    if drawing.has_title and (unit := drawing.tag[-digits:][:unit_digits]).isdigit()
+                    and int(unit) >= start_unit]
+    drawings = list(drawings)
+    tagging_with_unit(drawings, start_unit, unit_digits=unit_digits, seq_digits=digits - unit_digits)
+    return {drawing.tag: f"{prefix}{drawing.number}" for drawing in drawings if drawing.tag != f"{prefix}{drawing.number}"}
+
+
+def _category(tag: Optional[str]) -> str:
+    if tag == "DWG.NO.":
+        return TITLE
+    if tag in ("PID.No", "OriginOrDestination", "TAG"):
+        return CONNECTOR
+    return TEXT
+
+
+def plan_renumbering(pnid: PnID, mapping: Dict[str, str], config: dict) -> List[Change]:
+    """
+    All texts referring old sheet numbers, every reference replaced at once so chains like A->B, B->C are safe
+    :param pnid:
+    :param mapping: {old sheet number: new sheet number}
+    :param config:
+    """
+    digits = config["drawing"]["number_digits"]
+    mapping = {old.upper(): new for old, new in mapping.items() if old != new}
+    if not mapping:
+        return []
+    regex = re.compile(r'(?<![A-Z0-9])(%s)(?![A-Z0-9])' % '|'.join(map(re.escape, sorted(mapping, key=len, reverse=True))),
+                       re.IGNORECASE)
+    # current text and category by handle
+    planned: Dict[str, List[str]] = {}
+    index = pnid.text_index
+    for old in mapping:
+        for entry in index.exact(old):
+            if entry.handle not in planned:
+                planned[entry.handle] = [entry.text, _category(entry.tag)]
+    for handle, (text, category) in planned.items():
+        planned[handle].append(regex.sub(lambda match: mapping[match.group(1).upper()], text))
+
+    # P&ID No. is the full sheet tag, replaced above, see connector_numbering.
+    # TAG is prefixed by the drawing number.
+    short = {old[-digits:]: new[-digits:] for old, new in mapping.items()}
+    for connector in pnid.main_connectors:
+        handle = connector.record.attribute_handles.get("TAG")
+        if handle is None:
+            continue
+        text = planned[handle][2] if handle in planned else connector.get_attribute_text("TAG")
+        if text[:digits] not in short:
+            continue
+        new = short[text[:digits]] + text[digits:]
+        if handle in planned:
+            planned[handle][2] = new
+        else:
+            planned[handle] = [text, CONNECTOR, new]
+    return [Change(handle, category, old, new) for handle, (old, category, new) in sorted(planned.items())
+            if old != new]
+
+
+def renumber_sheets(pnid: PnID, mapping: Dict[str, str], config: dict, changelog: str = None) -> List[Change]:
+    """
+    Rewrite title blocks, connector references and texts in one batch
+    :param changelog: path of change report, for reverse renumbering
+    :return: applied changes
+    """
+    with tracer.span("renumber_sheets") as span:
+        changes = plan_renumbering(pnid, mapping, config)
+        batch = pnid.new_batch()
+        for change, target in zip(changes, pnid.resolve_many(change.handle for change in changes)):
+            batch.set(target, "TextString", change.new)
+        batch.commit()
+        span.count(sheets=len(mapping), changes=len(changes))
+    # cached values are stale
+    for drawing in pnid.drawings:
+        if drawing.tag in mapping:
+            drawing.refresh()
+    pnid.init_components()
+    if changelog:
+        write_changelog(changes, changelog)
+    print(f"Renumbered {len(mapping)} sheets, {len(changes)} texts: {summarize(changes)}")
+    return changes
+
+
+if __name__ == '__main__':
+    conf = load_config('config.ini')
+    p = PnID(config=conf)
+    renumber_sheets(p, number_map(p, conf), conf, 'renumber.log')
@@ -0,0 +1,80 @@
+# Bounded LRU of COM objects resolved by handle
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, List
+
+import dxf
+from utils import cast_to
+
+
+class HandleResolver:
+    def __init__(self, doc, maxsize: int = 4096, on_write: Callable[[Any, str, Any], None] = None):
+        """
+        :param doc: AcadDocument
+        :param maxsize: max number of live objects kept
+        :param on_write: called with (target, prop, value) after writes outside a batch, see batch.write
+        """
+        self.doc = doc
+        self.maxsize = maxsize
+        self.on_write = on_write
+        self.hits = 0
+        self.misses = 0
+        self._objects = OrderedDict()
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __contains__(self, handle: str):
+        return handle in self._objects
+
+    def _load(self, handle: str):
+        obj = self.doc.HandleToObject(handle)
+        if (entity := dxf.by_object_name.get(obj.ObjectName)) is not None:
+            return cast_to(obj, entity.interface)
+        return obj
+
+    def _put(self, handle: str, obj):
+        self._objects[handle] = obj
+        while len(self._objects) > self.maxsize:
+            self._objects.popitem(last=False)
+
+    def resolve(self, handle: str):
+        """
+        Typed COM object of the handle
+        """
+        if handle in self._objects:
+            self.hits += 1
+            self._objects.move_to_end(handle)
+            return self._objects[handle]
+        self.misses += 1
+        obj = self._load(handle)
+        self._put(handle, obj)
+        return obj
+
+    __call__ = resolve
+
+    def resolve_many(self, handles: Iterable[str]) -> List:
+        """
+        Resolve a batch of handles, in order
+        """
+        handles = list(handles)
+        missing = [handle for handle in dict.fromkeys(handles) if handle not in self._objects]
+        self.hits += len(handles) - len(missing)
+        self.misses += len(missing)
+        loaded = {handle: self._load(handle) for handle in missing}
+        result = []
+        for handle in handles:
+            if handle in loaded:
+                obj = loaded[handle]
+            else:
+                obj = self._objects[handle]
+                self._objects.move_to_end(handle)
+            result.append(obj)
+        for handle, obj in loaded.items():
+            self._put(handle, obj)
+        return result
+
+    def evict(self, handle: str):
+        self._objects.pop(handle, None)
+
+    def clear(self):
+        self._objects.clear()
@@ -1,26 +1,55 @@
 # Compress multiple layers to one for reference insertion, avoid breaking cleanness of the target drawing.
+from typing import List, NamedTuple
 
+import dxf
 from caddoc import CADDoc
+from utils import escape_wildcards
+
+# filter of visible drawing objects
+DRAWING_OBJECTS = (0, ",".join(entity.type_name for entity in dxf.AllDrawingObjects))
+VISIBLE = [(-4, "<NOT"), (60, 1), (-4, "NOT>")]
+BYLAYER_LINETYPE = (6, "BYLAYER")
+# 256 means color by layer
+BYLAYER_COLOR = (62, 256)
+
+
+class LayerState(NamedTuple):
+    name: str
+    on: bool
+    frozen: bool
+    linetype: str
+    true_color: object
+
+
+def snapshot_layers(doc: CADDoc) -> List[LayerState]:
+    """
+    Read layer table once
+    """
+    return [LayerState(layer.Name, layer.LayerOn, layer.Freeze, layer.Linetype, layer.TrueColor)
+            for layer in doc.doc.Layers]
 
 
 def compress(filepath: str = None):
     doc = CADDoc(filepath=filepath, load_data=False)
-    entities = doc.select_all_drawing_objects()
-    print(f"Starting with {len(entities)} drawing objects...")
-    counter = 0
-    for entity in entities:
-        layer_name = entity.Layer
-        layer = doc.doc.Layers.Item(layer_name)
-        if layer_name != "0" and layer.LayerOn and (not layer.Freeze) and entity.Visible:
-            if entity.Linetype == "BYLAYER":
-                entity.Linetype = layer.Linetype
-            # 192 means color by layer
-            if entity.TrueColor.ColorMethod == 192:
-                entity.TrueColor = layer.TrueColor
-            entity.Layer = "0"
-            # entity.TrueColor = color
-            counter += 1
-    print(f"Finish compress {counter} objects.")
+    layers = snapshot_layers(doc)
+    print(f"Starting with {len(layers)} layers...")
+    skipped = 0
+    batch = doc.new_batch()
+    for layer in layers:
+        # skip whole layer, entities are never touched
+        if layer.name == "0" or (not layer.on) or layer.frozen:
+            skipped += 1
+            continue
+        filters = [DRAWING_OBJECTS, (8, escape_wildcards(layer.name))] + VISIBLE
+        for entity in doc.select_filtered(filters + [BYLAYER_LINETYPE]):
+            batch.set(entity, "Linetype", layer.linetype)
+        for entity in doc.select_filtered(filters + [BYLAYER_COLOR]):
+            batch.set(entity, "TrueColor", layer.true_color)
+        for entity in doc.select_filtered(filters):
+            batch.set(entity, "Layer", "0")
+    counter = batch.commit()
+    print(f"{skipped} layers skipped.")
+    print(f"Finish compress, {counter} properties written.")
 
 
 if __name__ == "__main__":
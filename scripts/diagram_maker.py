@@ -1,25 +1,170 @@
 # Generate a diagram showing relationship of drawings and connectors
+# Records are streamed into the svg file, from a live document or a cached record file
+import json
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+from xml.sax.saxutils import escape, quoteattr
+
+from checker.connectors import get_dwg_number, get_unit
+from config import load_config
 from pnid import PnID
-import svgwrite
 
 
-def main(pid: PnID, outfile):
-    svg = svgwrite.Drawing(outfile)
-    for drawing in pid.drawings:
-        x = drawing.position.x
-        y = drawing.position.y
-        w = drawing.width
-        h = drawing.height
-        svg.add(svg.rect(insert=(x, y), size=(w, h), fill='gray'))
-    svg.save()
+class Bounds(NamedTuple):
+    min_x: float
+    min_y: float
+    max_x: float
+    max_y: float
+
+
+class SheetRecord(NamedTuple):
+    number: str
+    unit: str
+    x: float
+    y: float
+    width: float
+    height: float
+
+
+class LinkRecord(NamedTuple):
+    tag: str
+    from_sheet: str
+    to_sheet: str
+
+
+class LevelOfDetail(NamedTuple):
+    sheet_numbers: bool = True
+    links: bool = True
+    link_labels: bool = False
+    font_size: float = 60
+
+
+LOD_LOW = LevelOfDetail(sheet_numbers=False, links=False)
+LOD_MEDIUM = LevelOfDetail()
+LOD_HIGH = LevelOfDetail(link_labels=True)
+
+Record = Union[Bounds, SheetRecord, LinkRecord]
+_record_types = {'bounds': Bounds, 'sheet': SheetRecord, 'link': LinkRecord}
+_record_names = {record_type: name for name, record_type in _record_types.items()}
+
+
+def iter_records(pid: PnID, config: dict) -> Iterator[Record]:
+    """
+    Records of a live document: bounds first, then sheets, then links
+    """
+    drawings = [drawing for drawing in pid.drawings if drawing.has_title]
+    yield Bounds(min((d.min_point.x for d in drawings), default=0),
+                 min((d.min_point.y for d in drawings), default=0),
+                 max((d.max_point.x for d in drawings), default=0),
+                 max((d.max_point.y for d in drawings), default=0))
+    for drawing in drawings:
+        number = drawing.tag[-config["drawing"]["number_digits"]:]
+        yield SheetRecord(number, get_unit(number, config), drawing.min_point.x, drawing.min_point.y,
+                          drawing.width, drawing.height)
+    yield from pair_links(pid.main_connectors, config)
+
+
+def pair_links(connectors: Iterable, config: dict) -> Iterator[LinkRecord]:
+    """
+    Pair TO/FROM connectors by tag in one pass
+    """
+    exits: Dict[str, str] = {}
+    entries: Dict[str, str] = {}
+    for connector in connectors:
+        if connector.drawing is None or not connector.drawing.has_title:
+            continue
+        tag = connector.tag
+        if not tag:
+            continue
+        if connector.is_to:
+            exits[tag] = get_dwg_number(connector, config)
+        elif connector.is_from:
+            entries[tag] = get_dwg_number(connector, config)
+        if tag in exits and tag in entries:
+            yield LinkRecord(tag, exits.pop(tag), entries.pop(tag))
+
+
+def save_records(records: Iterable[Record], path: str):
+    """
+    Cache records as json lines
+    """
+    with open(path, 'w', encoding='utf8') as file:
+        for record in records:
+            file.write(json.dumps([_record_names[type(record)], *record], ensure_ascii=False))
+            file.write('\n')
+
+
+def load_records(path: str) -> Iterator[Record]:
+    with open(path, encoding='utf8') as file:
+        for line in file:
+            name, *values = json.loads(line)
+            yield _record_types[name](*values)
+
+
+def _view_box(bounds: Bounds, margin: float) -> Tuple[float, float, float, float]:
+    # svg y axis points down
+    return (bounds.min_x - margin, -bounds.max_y - margin,
+            bounds.max_x - bounds.min_x + 2 * margin, bounds.max_y - bounds.min_y + 2 * margin)
+
+
+def render(records: Iterable[Record], outfile: str, lod: LevelOfDetail = LOD_MEDIUM, margin: float = 100):
+    """
+    Stream records into svg, sheets are grouped by unit
+    :param records: bounds first, then sheets, then links
+    :param outfile:
+    :param lod: level of detail
+    :param margin:
+    :return:
+    """
+    centers: Dict[str, Tuple[float, float]] = {}
+    unit: Optional[str] = None
+    in_links = False
+    with open(outfile, 'w', encoding='utf8') as svg:
+        svg.write('<?xml version="1.0" encoding="utf-8"?>\n')
+        for record in records:
+            if isinstance(record, Bounds):
+                view_box = ' '.join(f'{value:.1f}' for value in _view_box(record, margin))
+                svg.write(f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{view_box}">\n')
+                svg.write(f'<style>.sheet{{fill:#ddd;stroke:#666}}.number{{font-size:{lod.font_size}px;'
+                          f'text-anchor:middle}}.link{{stroke:coral;stroke-width:4;opacity:.6}}'
+                          f'.label{{font-size:{lod.font_size / 2}px}}</style>\n')
+            elif isinstance(record, SheetRecord):
+                if record.unit != unit:
+                    if unit is not None:
+                        svg.write('</g>\n')
+                    unit = record.unit
+                    svg.write(f'<g class="unit" data-unit={quoteattr(unit)}>\n')
+                cx = record.x + record.width / 2
+                cy = -(record.y + record.height / 2)
+                centers[record.number] = (cx, cy)
+                svg.write(f'<rect class="sheet" x="{record.x:.1f}" y="{-(record.y + record.height):.1f}" '
+                          f'width="{record.width:.1f}" height="{record.height:.1f}"/>\n')
+                if lod.sheet_numbers:
+                    svg.write(f'<text class="number" x="{cx:.1f}" y="{cy:.1f}">{escape(record.number)}</text>\n')
+            elif isinstance(record, LinkRecord) and lod.links:
+                if not in_links:
+                    if unit is not None:
+                        svg.write('</g>\n')
+                        unit = None
+                    svg.write('<g class="links">\n')
+                    in_links = True
+                start = centers.get(record.from_sheet)
+                end = centers.get(record.to_sheet)
+                if start is None or end is None:
+                    continue
+                svg.write(f'<line class="link" x1="{start[0]:.1f}" y1="{start[1]:.1f}" '
+                          f'x2="{end[0]:.1f}" y2="{end[1]:.1f}"/>\n')
+                if lod.link_labels:
+                    svg.write(f'<text class="label" x="{(start[0] + end[0]) / 2:.1f}" '
+                              f'y="{(start[1] + end[1]) / 2:.1f}">{escape(record.tag)}</text>\n')
+        if unit is not None or in_links:
+            svg.write('</g>\n')
+        svg.write('</svg>\n')
 
 
-def test_svg():
-    svg = svgwrite.Drawing('test.svg', viewBox='-10, -10, 1000, 1000')
-    svg.add(svg.rect(insert=(0, 0), size=(800, 600), fill='coral'))
-    svg.save()
+def main(pid: PnID, outfile, conf=None, lod: LevelOfDetail = LOD_MEDIUM):
+    render(iter_records(pid, load_config(conf)), outfile, lod)
 
 
 if __name__ == '__main__':
-    # main(PnID(), 'test.svg')
-    test_svg()
+    config_file = r'..\config.ini'
+    main(PnID(config=load_config(config_file)), 'diagram.svg', config_file)
@@ -1,38 +1,39 @@
 # Tagging tie-in points
 from collections import defaultdict
 
+from ordering import COLUMNS, fetch_positions, order_by_sheet
 from pnid import PnID
-from point import Point
+from tracing import tracer
 from utils import get_attribute
 
 
-def tagging(pnid: PnID):
+def tagging(pnid: PnID, reading_order: str = COLUMNS, tolerance: float = 1):
     tp_counters = defaultdict(int)
-    tpoints_by_drawing = defaultdict(list)
     counter = 0
-    # Group by drawing
-    for tpoint in pnid.blockrefs["TieIn"]:
-        drawing = pnid.locate(tpoint)
-        tpoints_by_drawing[int(drawing.tag[-4:])].append(tpoint)
-
-    for number in sorted(tpoints_by_drawing):
-
-        if number > 10:
-            tpoints = tpoints_by_drawing[number]
-            sorted_by_y = sorted(tpoints, key=lambda tp: -Point(*tp.InsertionPoint).y)
-            sorted_by_x = sorted(sorted_by_y, key=lambda tp: Point(*tp.InsertionPoint).x)
-            for tp in sorted_by_x:
-                tag = get_attribute(tp, "TAG")
+    placed = fetch_positions(pnid.find_blockrefs("^TieIn$", ["TieIn"]))
+    tpoints = {entry.handle: entry.item for entry in placed}
+    ordered = order_by_sheet(placed, pnid.locate_point, reading_order, tolerance)
+    batch = pnid.new_batch()
+    for drawing in sorted(ordered, key=lambda dwg: int(dwg.tag[-4:])):
+        if int(drawing.tag[-4:]) > 10:
+            for handle in ordered[drawing]:
+                tag = get_attribute(tpoints[handle], "TAG")
                 unit = tag.TextString[:2]
                 tp_counters[unit] += 1
-                tag.TextString = f"{unit}{tp_counters[unit]:02}"
+                batch.set(tag, "TextString", f"{unit}{tp_counters[unit]:02}")
                 counter += 1
+    batch.commit()
 
     print(f"{counter} tps tagged.")
     print("tpoints_counter:")
     print(tp_counters)
+    return counter
 
 
 if __name__ == "__main__":
-    p = PnID()
-    tagging(p)
+    tracer.enable()
+    with tracer.span("tie_in_tagging") as span:
+        counter = tagging(PnID())
+        span.count(tie_ins=counter)
+    print("Time spent: %.2fs" % span.wall)
+    tracer.dump("tie_in_tagging.trace.json")
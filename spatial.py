@@ -0,0 +1,72 @@
+from collections import defaultdict
+from math import ceil, floor, hypot
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from point import Point
+
+
+class GridIndex:
+    """
+    Spatial hash of points, bucketed in square cells of cell_size
+    """
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self._cells = defaultdict(list)
+
+    def __len__(self):
+        return sum(len(cell) for cell in self._cells.values())
+
+    def cell(self, point: Point) -> Tuple[int, int]:
+        return floor(point.x / self.cell_size), floor(point.y / self.cell_size)
+
+    def insert(self, point: Point, item: Any):
+        self._cells[self.cell(point)].append((point, item))
+
+    def remove(self, point: Point, item: Any):
+        cell = self._cells.get(self.cell(point))
+        if cell:
+            cell.remove((point, item))
+
+    def nearby(self, point: Point, radius: float) -> Iterator[Tuple[float, Point, Any]]:
+        """
+        Yield (distance, point, item) for every item within radius
+        """
+        col, row = self.cell(point)
+        span = max(ceil(radius / self.cell_size), 1)
+        for i in range(col - span, col + span + 1):
+            for j in range(row - span, row + span + 1):
+                for item_point, item in self._cells.get((i, j), ()):
+                    distance = hypot(item_point.x - point.x, item_point.y - point.y)
+                    if distance <= radius:
+                        yield distance, item_point, item
+
+    def nearest(self, point: Point, radius: float) -> Optional[Tuple[float, Point, Any]]:
+        return min(self.nearby(point, radius), key=lambda found: found[0], default=None)
+
+
+class SheetLocator:
+    """
+    Locate points into drawings with a grid of border boxes, instead of testing every drawing
+    """
+    def __init__(self, drawings: Iterable):
+        self.drawings = list(drawings)
+        self.cell_size = max((max(d.width, d.height) for d in self.drawings), default=1) or 1
+        self._cells = defaultdict(list)
+        for drawing in self.drawings:
+            min_col, min_row = self.cell(drawing.min_point)
+            max_col, max_row = self.cell(drawing.max_point)
+            for col in range(min_col, max_col + 1):
+                for row in range(min_row, max_row + 1):
+                    self._cells[(col, row)].append(drawing)
+
+    def cell(self, point: Point) -> Tuple[int, int]:
+        return floor(point.x / self.cell_size), floor(point.y / self.cell_size)
+
+    def locate(self, point: Point):
+        for drawing in self._cells.get(self.cell(point), ()):
+            if point in drawing:
+                return drawing
+        return None
+
+    def locate_all(self, points: Iterable[Point]) -> List:
+        return [self.locate(point) for point in points]
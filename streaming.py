@@ -0,0 +1,178 @@
+# Per-sheet streaming: one Drawing at a time, results written as they come,
+# COM references of a sheet released before the next one.
+# Usage: with open('result.jsonl', 'w') as out:
+#            stream(PnID(), [connector_checks(config)], out)
+# Edits go through a batch committed inside the processor, one per sheet.
+import json
+import sys
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+from checker.connectors import check_main_connector, problem_line
+from components import MainConnector
+from config import load_config
+from drawing import Drawing
+from pnid import PnID
+from point import Point
+from registry import MAIN_CONNECTOR
+from tracing import tracer
+
+_SHEET_FILTERS = [(0, "INSERT")]
+
+
+class Sheet(NamedTuple):
+    drawing: Drawing
+    # wrapped components by category, raw blockrefs for categories without wrapper
+    components: Dict[str, list]
+
+    @property
+    def tag(self) -> Optional[str]:
+        return self.drawing.tag
+
+
+class ConnectorSummary(NamedTuple):
+    """
+    What pairing needs of a main connector, kept after its sheet is released
+    """
+    handle: str
+    sheet: str
+    tag: str
+    route: str
+    endpoint: str
+    link_drawing: str
+    position: Point
+
+    @classmethod
+    def from_connector(cls, connector: MainConnector) -> 'ConnectorSummary':
+        route = 'TO' if connector.is_to else 'FROM' if connector.is_from else ''
+        return cls(connector.handle, connector.drawing.tag, connector.tag, route, connector.endpoint or '',
+                   connector.link_drawing, connector.position)
+
+
+def read_sheet(pnid: PnID, drawing: Drawing) -> Sheet:
+    """
+    Components inside the sheet box, by one area selection
+    :param pnid: area must be on screen
+    :param drawing:
+    """
+    registry = pnid.registry
+    components = defaultdict(list)
+    for blockref in pnid.select_filtered(_SHEET_FILTERS, drawing.min_point, drawing.max_point):
+        name = pnid.effective_name(blockref)
+        if (category := registry.classify(name)) is None:
+            continue
+        # crossing selection also catches blockrefs of neighbour sheets
+        if pnid.locate(blockref) is not drawing:
+            continue
+        if (wrapper := registry.wrapper(category)) is not None:
+            component = wrapper(blockref, pnid.resolver, name)
+            component.drawing = drawing
+            components[category].append(component)
+        else:
+            components[category].append(blockref)
+    return Sheet(drawing, dict(components))
+
+
+def iter_sheets(pnid: PnID, drawings: Iterable[Drawing] = None) -> Iterator[Sheet]:
+    """
+    Sheets one by one, the previous sheet is released when the next one is read
+    :param drawings: default is all titled drawings
+    """
+    if drawings is None:
+        drawings = [drawing for drawing in pnid.drawings if drawing.has_title]
+    pnid.zoom_extents()
+    for drawing in drawings:
+        with tracer.span("read_sheet") as span:
+            sheet = read_sheet(pnid, drawing)
+            span.count(components=sum(len(items) for items in sheet.components.values()))
+        yield sheet
+        sheet.components.clear()
+        del sheet
+        pnid.resolver.clear()
+
+
+def summarize_connectors(sheet: Sheet) -> Tuple[List[ConnectorSummary], List[dict]]:
+    """
+    :return: (summaries, problems of connectors missing attributes)
+    """
+    summaries = []
+    problems = []
+    for connector in sheet.components.get(MAIN_CONNECTOR, ()):
+        try:
+            summaries.append(ConnectorSummary.from_connector(connector))
+        except KeyError as err:
+            # left out of pairing
+            problems.append(problem_line(connector, f"Not paired, missing attribute {err}"))
+    return summaries, problems
+
+
+def pair_summaries(summaries: Iterable[ConnectorSummary]) -> Iterator[dict]:
+    """
+    Links and problems of connector pairs by tag, same rule as checker.connectors.show_links
+    """
+    by_tag = defaultdict(list)
+    for summary in summaries:
+        by_tag[summary.tag].append(summary)
+    for tag in sorted(by_tag):
+        group = by_tag[tag]
+        exits = [summary for summary in group if summary.route == 'TO']
+        entries = [summary for summary in group if summary.route == 'FROM']
+        if len(group) < 3 and exits and entries:
+            yield {"link": tag, "from": exits[0].sheet, "to": entries[0].sheet}
+        elif len(group) >= 3:
+            yield {"problem": "Duplicated number", "number": tag, "drawings": sorted({s.sheet for s in group})}
+
+
+Processor = Callable[[Sheet], Iterable[dict]]
+
+
+def connector_checks(config: dict) -> Processor:
+    """
+    checker.connectors.check_main_connector on each sheet
+    """
+    def process(sheet: Sheet) -> Iterator[dict]:
+        for connector in sheet.components.get(MAIN_CONNECTOR, ()):
+            if (problem := check_main_connector(connector, config)) is not None:
+                yield problem
+    return process
+
+
+def write_result(out: TextIO, sheet: Optional[str], result: dict):
+    out.write(json.dumps({"sheet": sheet, **result}, ensure_ascii=False))
+    out.write('\n')
+
+
+def stream(pnid: PnID, processors: Iterable[Processor], out: TextIO = sys.stdout, pairing: bool = True) -> int:
+    """
+    Run processors sheet by sheet, then pair connectors from summaries
+    :param pnid:
+    :param processors: functions of a sheet, returning result dicts
+    :param out: JSON lines output
+    :param pairing: emit connector links from per-sheet summaries
+    :return: number of results
+    """
+    processors = list(processors)
+    summaries: List[ConnectorSummary] = []
+    counter = 0
+    with tracer.span("stream") as span:
+        for sheet in iter_sheets(pnid):
+            for processor in processors:
+                for result in processor(sheet):
+                    write_result(out, sheet.tag, result)
+                    counter += 1
+            if pairing:
+                sheet_summaries, problems = summarize_connectors(sheet)
+                summaries.extend(sheet_summaries)
+                for problem in problems:
+                    write_result(out, sheet.tag, problem)
+                    counter += 1
+        for result in pair_summaries(summaries):
+            write_result(out, None, result)
+            counter += 1
+        span.count(results=counter, connectors=len(summaries))
+    return counter
+
+
+if __name__ == '__main__':
+    conf = load_config('config.ini')
+    stream(PnID(config=conf), [connector_checks(conf)])
@@ -0,0 +1,630 @@
+# Synthetic P&ID projects for scaling tests and shareable fixtures, deterministic from a seed.
+# Block names and attribute tags follow what PnID expects, see registry.py.
+# DXF:       write_dxf(generate(Settings(sheets=300), seed=1), 'synthetic.dxf')
+# In memory: pnid = PnID(app=StandInApplication(StandInDocument(generate(Settings(sheets=3000), seed=1))))
+import os
+import re
+from bisect import bisect_right
+from collections import defaultdict
+from math import floor
+from random import Random
+from types import SimpleNamespace
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import constants
+from point import Point
+
+INSERT = 'INSERT'
+TEXT = 'TEXT'
+
+# defects of connector pairs
+MISSING_NUMBER = 'missing number'
+MISSING_ROUTE = 'missing route'
+WRONG_DIRECTION = 'wrong direction'
+WRONG_NUMBER = 'wrong number'
+MISSING_LINK = 'missing link'
+UNPAIRED = 'unpaired'
+DUPLICATED = 'duplicated'
+DEFECTS = (MISSING_NUMBER, MISSING_ROUTE, WRONG_DIRECTION, WRONG_NUMBER, MISSING_LINK, UNPAIRED, DUPLICATED)
+
+SERVICES = ('PW', 'CW', 'N2', 'IA', 'HC', 'NG', 'ST')
+FUNCTIONS = ('PT', 'TT', 'FT', 'LT', 'PG', 'TG', 'PI', 'FV', 'PDT', 'PSV')
+BUBBLE_NAMES = ('DI_LOCAL', 'SH_PRI_FRONT', 'SC_LOCAL', 'DI_BACK')
+VALVE_NAMES = ('VALVE_GATE', 'VALVE_BALL', 'VALVE_GLOBE', 'VALVE_CHECK')
+
+BORDER_SIZE = (841, 594)
+SHEET_PITCH = (900, 660)
+
+
+class Settings(NamedTuple):
+    sheets: int = 30
+    # sheets per row of the layout
+    columns: int = 10
+    # connector pairs starting on each sheet
+    links_per_sheet: int = 4
+    utility_connectors_per_sheet: int = 2
+    bubbles_per_sheet: int = 12
+    pipe_tags_per_sheet: int = 10
+    strainers_per_sheet: int = 1
+    tie_ins_per_sheet: int = 1
+    valves_per_sheet: int = 6
+    # texts referring other sheets, e.g. "SEE P2402"
+    notes_per_sheet: int = 1
+    # rate of defective connector pairs
+    defect_rate: float = 0.05
+    # rate of dynamic blockrefs with anonymous "*U..." names
+    anonymous_rate: float = 0.5
+    number_prefix: str = 'P2'
+    number_digits: int = 3
+    unit_digits: int = 1
+    start_unit: int = 4
+    connector_digits: int = 5
+
+
+class Link(NamedTuple):
+    tag: str
+    exit_sheet: int
+    entry_sheet: int
+    service: str
+    defect: Optional[str]
+
+
+class Spec(NamedTuple):
+    """
+    One generated entity, attribute handles follow the entity handle
+    """
+    kind: str
+    handle: int
+    # effective name, or text content of TEXT
+    name: str
+    # Name of the blockref, "*U..." for anonymous dynamic blockrefs
+    block_name: str
+    position: Point
+    attributes: Tuple[Tuple[str, str], ...] = ()
+    properties: Tuple[Tuple[str, object], ...] = ()
+
+
+def sheet_tags(settings: Settings) -> List[str]:
+    seq_digits = settings.number_digits - settings.unit_digits
+    per_unit = 10 ** seq_digits - 1
+    last_unit = settings.start_unit + (settings.sheets - 1) // per_unit
+    if last_unit >= 10 ** settings.unit_digits:
+        raise ValueError(f"{settings.sheets} sheets exceed {settings.number_digits} digit drawing numbers.")
+    return [f"{settings.number_prefix}{settings.start_unit + i // per_unit}{i % per_unit + 1:0{seq_digits}d}"
+            for i in range(settings.sheets)]
+
+
+def sheet_origin(settings: Settings, index: int) -> Point:
+    return Point((index % settings.columns) * SHEET_PITCH[0], -(index // settings.columns) * SHEET_PITCH[1])
+
+
+def plan_links(settings: Settings, rng: Random) -> List[Link]:
+    """
+    Connector pairs between nearby sheets, numbered by exiting sheet
+    """
+    tags = sheet_tags(settings)
+    seq_digits = settings.connector_digits - settings.number_digits
+    links = []
+    for index, tag in enumerate(tags):
+        if settings.sheets < 2:
+            break
+        for seq in range(1, min(settings.links_per_sheet, 10 ** seq_digits - 1) + 1):
+            other = index
+            while other == index:
+                other = min(max(index + rng.randint(-5, 5), 0), settings.sheets - 1)
+            defect = rng.choice(DEFECTS) if rng.random() < settings.defect_rate else None
+            number = f"{tag[-settings.number_digits:]}{seq:0{seq_digits}d}"
+            links.append(Link(number, index, other, rng.choice(SERVICES), defect))
+    return links
+
+
+class _Handles:
+    def __init__(self, start: int = 0x1000):
+        self.next = start
+
+    def take(self, count: int = 1) -> int:
+        handle = self.next
+        self.next += count
+        return handle
+
+
+def _block(handles: _Handles, name: str, position: Point, attributes: Dict[str, str] = None,
+           properties: Dict[str, object] = None, anonymous: Optional[str] = None) -> Spec:
+    attributes = tuple((attributes or {}).items())
+    # blockref, attributes, SEQEND
+    handle = handles.take(len(attributes) + 2)
+    return Spec(INSERT, handle, name, anonymous or name, position, attributes, tuple((properties or {}).items()))
+
+
+def _connector(settings: Settings, handles: _Handles, rng: Random, anonymous: Dict[tuple, str], tags: List[str],
+               origin: Point, link: Link, exiting: bool) -> Spec:
+    other = link.entry_sheet if exiting else link.exit_sheet
+    tag = link.tag
+    route = f"{'TO' if exiting else 'FROM'} {tags[other]}"
+    pid_no = tags[other]
+    # exits on the right half, entries on the left half
+    right = exiting
+    if link.defect == WRONG_DIRECTION and not exiting:
+        right = True
+    elif link.defect == MISSING_NUMBER:
+        tag = ''
+    elif link.defect == MISSING_ROUTE and exiting:
+        route = ''
+    elif link.defect == WRONG_NUMBER and exiting:
+        tag = f"{tags[other][-settings.number_digits:]}{tag[settings.number_digits:]}"
+    elif link.defect == MISSING_LINK:
+        pid_no = ''
+    x = origin.x + (BORDER_SIZE[0] - 80 if right else 20) + rng.uniform(0, 20)
+    y = origin.y + rng.uniform(60, BORDER_SIZE[1] - 60)
+    properties = {'Flip': False, 'TYPE': 'OFF-DRAWING'}
+    return _block(handles, 'Connector_Main', Point(x, y),
+                  {'TAG': tag, 'PID.No': pid_no, 'OriginOrDestination': route, 'Service': link.service, 'DESC': ''},
+                  properties, _anonymous_name(settings, rng, anonymous, 'Connector_Main', properties))
+
+
+def _anonymous_name(settings: Settings, rng: Random, anonymous: Dict[tuple, str], name: str,
+                    properties: Dict[str, object]) -> Optional[str]:
+    # one anonymous definition per dynamic block and property values
+    if rng.random() >= settings.anonymous_rate:
+        return None
+    key = (name, tuple(sorted(properties.items())))
+    if key not in anonymous:
+        anonymous[key] = f"*U{len(anonymous) + 1}"
+    return anonymous[key]
+
+
+def _random_point(rng: Random, origin: Point) -> Point:
+    return Point(origin.x + rng.uniform(30, BORDER_SIZE[0] - 30), origin.y + rng.uniform(60, BORDER_SIZE[1] - 30))
+
+
+def generate(settings: Settings = Settings(), seed: int = 0) -> Iterator[Spec]:
+    """
+    Entities sheet by sheet, same seed gives same project
+    """
+    rng = Random(seed)
+    handles = _Handles()
+    tags = sheet_tags(settings)
+    links = plan_links(settings, rng)
+    by_sheet = defaultdict(list)
+    for link in links:
+        by_sheet[link.exit_sheet].append((link, True))
+        if link.defect != UNPAIRED:
+            by_sheet[link.entry_sheet].append((link, False))
+        if link.defect == DUPLICATED:
+            by_sheet[link.entry_sheet].append((link, False))
+    anonymous: Dict[tuple, str] = {}
+    for index, tag in enumerate(tags):
+        origin = sheet_origin(settings, index)
+        unit = tag[len(settings.number_prefix):][:settings.unit_digits]
+        yield _block(handles, 'Border_A1', origin)
+        yield _block(handles, 'TitleBlock_A1', Point(origin.x + BORDER_SIZE[0] - 180, origin.y + 10),
+                     {'DWG.NO.': tag, 'TITLE': f'SYNTHETIC SHEET {index + 1}'})
+        for link, exiting in by_sheet[index]:
+            yield _connector(settings, handles, rng, anonymous, tags, origin, link, exiting)
+        for k in range(settings.utility_connectors_per_sheet):
+            yield _block(handles, 'Connector_Utility', _random_point(rng, origin),
+                         {'TAG': f"{tag[-settings.number_digits:]}U{k + 1}", 'PID.No': '',
+                          'Service': rng.choice(SERVICES)})
+        for k in range(settings.bubbles_per_sheet):
+            name = rng.choice(BUBBLE_NAMES)
+            properties = {'Visibility': rng.choice(('A', 'B'))}
+            yield _block(handles, name, _random_point(rng, origin),
+                         {'FUNCTION': rng.choice(FUNCTIONS), 'TAG': f"{unit}{rng.randint(1, 300):03d}"},
+                         properties, _anonymous_name(settings, rng, anonymous, name, properties))
+        for k in range(settings.pipe_tags_per_sheet):
+            line_tag = f"{rng.choice(SERVICES)}{unit}{rng.randint(1, 999):03d}-{rng.choice((25, 50, 80, 100))}-B2RF1"
+            yield _block(handles, 'pipe_tag', _random_point(rng, origin), {'TAG': line_tag})
+        for k in range(settings.strainers_per_sheet):
+            yield _block(handles, 'STRAINER_Y', _random_point(rng, origin), {'TAG': f"STR-{unit}{index:03d}{k}"})
+        for k in range(settings.tie_ins_per_sheet):
+            yield _block(handles, 'TieIn', _random_point(rng, origin), {'TAG': f"{int(unit):02d}00"})
+        for k in range(settings.valves_per_sheet):
+            yield _block(handles, rng.choice(VALVE_NAMES), _random_point(rng, origin))
+        for k in range(settings.notes_per_sheet):
+            other = tags[rng.randrange(settings.sheets)]
+            yield Spec(TEXT, handles.take(), f"SEE {other}", '', _random_point(rng, origin))
+
+
+def defects(settings: Settings = Settings(), seed: int = 0) -> List[Link]:
+    """
+    Defective connector pairs the project of the seed contains
+    """
+    return [link for link in plan_links(settings, Random(seed)) if link.defect]
+
+
+# DXF output, R12 ASCII with handles. Dynamic block properties are not kept, blockrefs use effective names.
+
+def _dxf_pairs(pairs: Iterable[Tuple[int, object]]) -> str:
+    return ''.join(f"{code}\n{value}\n" for code, value in pairs)
+
+
+def _block_definition(name: str, tags: Iterable[str]) -> str:
+    width, height = BORDER_SIZE if name.startswith('Border') else (40, 10)
+    pairs = [(0, 'BLOCK'), (8, '0'), (2, name), (70, 2), (10, 0.0), (20, 0.0), (30, 0.0), (3, name)]
+    corners = [(0, 0), (width, 0), (width, height), (0, height), (0, 0)]
+    for (x1, y1), (x2, y2) in zip(corners, corners[1:]):
+        pairs += [(0, 'LINE'), (8, '0'), (10, x1), (20, y1), (30, 0.0), (11, x2), (21, y2), (31, 0.0)]
+    for i, tag in enumerate(tags):
+        pairs += [(0, 'ATTDEF'), (8, '0'), (10, 1.0), (20, 1.0 + i * 3), (30, 0.0), (40, 2.5), (1, ''), (3, tag),
+                  (2, tag), (70, 0)]
+    pairs.append((0, 'ENDBLK'))
+    pairs.append((8, '0'))
+    return _dxf_pairs(pairs)
+
+
+def _dxf_entity(spec: Spec) -> str:
+    x, y = spec.position.x, spec.position.y
+    if spec.kind == TEXT:
+        return _dxf_pairs([(0, 'TEXT'), (5, f"{spec.handle:X}"), (8, '0'), (10, x), (20, y), (30, 0.0), (40, 2.5),
+                           (1, spec.name)])
+    pairs = [(0, 'INSERT'), (5, f"{spec.handle:X}"), (8, '0'), (2, spec.name), (10, x), (20, y), (30, 0.0)]
+    if spec.attributes:
+        pairs.insert(2, (66, 1))
+        for i, (tag, text) in enumerate(spec.attributes, start=1):
+            pairs += [(0, 'ATTRIB'), (5, f"{spec.handle + i:X}"), (8, '0'), (10, x + 1), (20, y + 1 + (i - 1) * 3),
+                      (30, 0.0), (40, 2.5), (1, text), (2, tag), (70, 0)]
+        pairs += [(0, 'SEQEND'), (5, f"{spec.handle + len(spec.attributes) + 1:X}"), (8, '0')]
+    return _dxf_pairs(pairs)
+
+
+def write_dxf(specs: Iterable[Spec], path: str) -> int:
+    """
+    Stream entities to a DXF file, block definitions are written after being collected
+    :return: number of entities
+    """
+    definitions: Dict[str, List[str]] = {}
+    counter = 0
+    entities_path = f"{path}.entities"
+    with open(entities_path, 'w', encoding='utf8') as entities:
+        last_handle = 0
+        for spec in specs:
+            if spec.kind == INSERT and spec.name not in definitions:
+                definitions[spec.name] = [tag for tag, _ in spec.attributes]
+            entities.write(_dxf_entity(spec))
+            last_handle = spec.handle + len(spec.attributes) + 2
+            counter += 1
+    with open(path, 'w', encoding='utf8') as file:
+        file.write(_dxf_pairs([(0, 'SECTION'), (2, 'HEADER'), (9, '$ACADVER'), (1, 'AC1009'), (9, '$HANDLING'),
+                               (70, 1), (9, '$HANDSEED'), (5, f"{last_handle:X}"), (0, 'ENDSEC'),
+                               (0, 'SECTION'), (2, 'BLOCKS')]))
+        for name, tags in definitions.items():
+            file.write(_block_definition(name, tags))
+        file.write(_dxf_pairs([(0, 'ENDSEC'), (0, 'SECTION'), (2, 'ENTITIES')]))
+        with open(entities_path, encoding='utf8') as entities:
+            for line in entities:
+                file.write(line)
+        file.write(_dxf_pairs([(0, 'ENDSEC'), (0, 'EOF')]))
+    os.remove(entities_path)
+    return counter
+
+
+# In-memory stand-ins of the COM objects used by CADDoc and PnID, without AutoCAD
+
+def _wildcard_regex(pattern: str) -> str:
+    """
+    AutoCAD wildcards: * ? # @ . [...] ~ and ` escape
+    """
+    negate = pattern.startswith('~')
+    if negate:
+        pattern = pattern[1:]
+    regex = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '`' and i + 1 < len(pattern):
+            i += 1
+            regex.append(re.escape(pattern[i]))
+        elif char == '*':
+            regex.append('.*')
+        elif char == '?':
+            regex.append('.')
+        elif char == '#':
+            regex.append(r'\d')
+        elif char == '@':
+            regex.append('[A-Za-z]')
+        elif char == '.':
+            regex.append('[^A-Za-z0-9]')
+        elif char == '[':
+            end = pattern.find(']', i)
+            if end < 0:
+                regex.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end]
+                regex.append('[^' + body[1:] + ']' if body.startswith('~') else '[' + body + ']')
+                i = end
+        else:
+            regex.append(re.escape(char))
+        i += 1
+    regex = ''.join(regex)
+    return f'(?!{regex}$)' if negate else regex
+
+
+def wildcard_match(patterns: str, name: str) -> bool:
+    """
+    Match a comma separated wildcard list like a selection filter, case insensitive
+    """
+    parts = re.split(r'(?<!`),', patterns)
+    return any(re.fullmatch(_wildcard_regex(part), name, re.IGNORECASE) for part in parts)
+
+
+class StandInAttribute:
+    __slots__ = ('Handle', 'TagString', 'TextString', 'InsertionPoint')
+    ObjectName = 'AcDbAttribute'
+
+    def __init__(self, handle: str, tag: str, text: str, position: tuple):
+        self.Handle = handle
+        self.TagString = tag
+        self.TextString = text
+        self.InsertionPoint = position
+
+    def _cast(self, interface: str):
+        return self
+
+
+class StandInProperty:
+    __slots__ = ('PropertyName', 'Value')
+
+    def __init__(self, name: str, value):
+        self.PropertyName = name
+        self.Value = value
+
+
+class StandInEntity:
+    __slots__ = ('Document', 'spec', 'Handle', 'InsertionPoint', 'Layer')
+
+    def __init__(self, document: 'StandInDocument', spec: Spec):
+        self.Document = document
+        self.spec = spec
+        self.Handle = f"{spec.handle:X}"
+        self.InsertionPoint = (spec.position.x, spec.position.y, 0.0)
+        self.Layer = '0'
+
+    def _cast(self, interface: str):
+        return self
+
+    def Delete(self):
+        self.Document.remove(self)
+
+    def GetBoundingBox(self) -> tuple:
+        x, y, z = self.InsertionPoint
+        return (x, y, z), (x + 40, y + 10, z)
+
+
+class StandInText(StandInEntity):
+    __slots__ = ('TextString',)
+    ObjectName = 'AcDbText'
+
+    def __init__(self, document: 'StandInDocument', spec: Spec):
+        super().__init__(document, spec)
+        self.TextString = spec.name
+
+
+class StandInBlockRef(StandInEntity):
+    __slots__ = ('Name', '_attributes', '_properties')
+    ObjectName = 'AcDbBlockReference'
+
+    def __init__(self, document: 'StandInDocument', spec: Spec):
+        super().__init__(document, spec)
+        self.Name = spec.block_name
+        self._attributes: Optional[List[StandInAttribute]] = None
+        self._properties: Optional[List[StandInProperty]] = None
+
+    @property
+    def EffectiveName(self) -> str:
+        return self.spec.name
+
+    @property
+    def HasAttributes(self) -> bool:
+        return bool(self.spec.attributes)
+
+    def GetAttributes(self) -> tuple:
+        # created on first access, 1M entities stay light
+        if self._attributes is None:
+            x, y, z = self.InsertionPoint
+            self._attributes = [StandInAttribute(f"{self.spec.handle + i:X}", tag, text, (x + 1, y + 1 + (i - 1) * 3, z))
+                                for i, (tag, text) in enumerate(self.spec.attributes, start=1)]
+        return tuple(self._attributes)
+
+    def GetDynamicBlockProperties(self) -> tuple:
+        if self._properties is None:
+            self._properties = [StandInProperty(name, value) for name, value in self.spec.properties]
+        return tuple(self._properties)
+
+    def GetBoundingBox(self) -> tuple:
+        x, y, z = self.InsertionPoint
+        width, height = BORDER_SIZE if self.spec.name.startswith('Border') else (40, 10)
+        return (x, y, z), (x + width, y + height, z)
+
+
+class StandInBlock:
+    __slots__ = ('Name',)
+
+    def __init__(self, name: str):
+        self.Name = name
+
+
+class StandInSelectionSet:
+    def __init__(self, document: 'StandInDocument', name: str):
+        self.document = document
+        self.Name = name
+        self._items: List[StandInEntity] = []
+
+    def AddItems(self, items):
+        self._items.extend(items)
+
+    def Select(self, mode, point1=None, point2=None, filter_type=None, filter_data=None):
+        filters = list(zip(filter_type or (), filter_data or ()))
+        self._items = self.document.query(mode, point1, point2, filters)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def Delete(self):
+        self.document.SelectionSets.remove(self)
+
+
+class StandInSelectionSets:
+    def __init__(self, document: 'StandInDocument'):
+        self.document = document
+        self._sets: List[StandInSelectionSet] = []
+
+    def Add(self, name: str) -> StandInSelectionSet:
+        if any(item.Name == name for item in self._sets):
+            raise ValueError(f"Duplicate selection set {name}")
+        selection_set = StandInSelectionSet(self.document, name)
+        self._sets.append(selection_set)
+        return selection_set
+
+    def remove(self, selection_set: StandInSelectionSet):
+        self._sets.remove(selection_set)
+
+    def __len__(self):
+        return len(self._sets)
+
+    def __iter__(self):
+        return iter(list(self._sets))
+
+    def Item(self, index: int) -> StandInSelectionSet:
+        return self._sets[index]
+
+
+class StandInDocument:
+    """
+    Document of generated entities, answers selections by type, name, attribute flag and area
+    """
+    def __init__(self, specs: Iterable[Spec], name: str = 'synthetic.dwg'):
+        self.Name = name
+        self.FullName = os.path.abspath(name)
+        self.Saved = True
+        self.SelectionSets = StandInSelectionSets(self)
+        self.commands: List[str] = []
+        self._entities: Dict[str, StandInEntity] = {}
+        # entity handles in order, attribute handles resolved to owners by bisection
+        self._starts: List[int] = []
+        self._by_name: Dict[str, List[StandInEntity]] = defaultdict(list)
+        self._cells: Dict[Tuple[int, int], List[StandInEntity]] = defaultdict(list)
+        for spec in specs:
+            entity = StandInBlockRef(self, spec) if spec.kind == INSERT else StandInText(self, spec)
+            self._entities[entity.Handle] = entity
+            self._starts.append(spec.handle)
+            self._by_name[spec.kind, spec.block_name].append(entity)
+            self._cells[self._cell(spec.position.x, spec.position.y)].append(entity)
+        self._starts.sort()
+        self.Blocks = [StandInBlock(name) for kind, name in self._by_name if kind == INSERT]
+
+    def __len__(self):
+        return len(self._entities)
+
+    @staticmethod
+    def _cell(x: float, y: float) -> Tuple[int, int]:
+        return floor(x / SHEET_PITCH[0]), floor(y / SHEET_PITCH[1])
+
+    @property
+    def ModelSpace(self) -> List[StandInEntity]:
+        return list(self._entities.values())
+
+    def HandleToObject(self, handle: str):
+        if (entity := self._entities.get(handle)) is not None:
+            return entity
+        value = int(handle, 16)
+        index = bisect_right(self._starts, value) - 1
+        if index >= 0:
+            owner = self._entities.get(f"{self._starts[index]:X}")
+            if isinstance(owner, StandInBlockRef) and value - owner.spec.handle <= len(owner.spec.attributes):
+                return owner.GetAttributes()[value - owner.spec.handle - 1]
+        raise KeyError(f"Unknown handle {handle}")
+
+    def remove(self, entity: StandInEntity):
+        del self._entities[entity.Handle]
+        self._by_name[entity.spec.kind, entity.spec.block_name].remove(entity)
+        self._cells[self._cell(entity.spec.position.x, entity.spec.position.y)].remove(entity)
+        self.Saved = False
+
+    def query(self, mode, point1, point2, filters: List[Tuple[int, object]]) -> List[StandInEntity]:
+        kinds = None
+        names = None
+        with_attributes = None
+        for code, value in filters:
+            if code == 0:
+                kinds = {kind.strip().upper() for kind in str(value).split(',')}
+            elif code == 2:
+                names = str(value)
+            elif code == 66:
+                with_attributes = bool(value)
+        keys = {(kind, name) for kind, name in self._by_name
+                if (kinds is None or kind in kinds) and (names is None or wildcard_match(names, name))}
+        if mode == constants.acSelectionSetAll or point1 is None or point2 is None:
+            candidates = (entity for key in keys for entity in self._by_name[key])
+        else:
+            candidates = (entity for entity in self._in_area(point1, point2)
+                          if (entity.spec.kind, entity.spec.block_name) in keys)
+        result = []
+        for entity in candidates:
+            if with_attributes is not None and bool(entity.spec.attributes) != with_attributes:
+                continue
+            result.append(entity)
+        return result
+
+    def _in_area(self, point1, point2) -> Iterator[StandInEntity]:
+        # by insertion point, crossing and window are not told apart
+        min_x, max_x = sorted((point1[0], point2[0]))
+        min_y, max_y = sorted((point1[1], point2[1]))
+        min_col, min_row = self._cell(min_x, min_y)
+        max_col, max_row = self._cell(max_x, max_y)
+        for col in range(min_col, max_col + 1):
+            for row in range(min_row, max_row + 1):
+                for entity in self._cells.get((col, row), ()):
+                    x, y, _ = entity.InsertionPoint
+                    if min_x <= x <= max_x and min_y <= y <= max_y:
+                        yield entity
+
+    def StartUndoMark(self):
+        pass
+
+    def EndUndoMark(self):
+        self.Saved = False
+
+    def SendCommand(self, command: str):
+        # recorded only, commands are not interpreted
+        self.commands.append(command)
+
+    def Save(self):
+        self.Saved = True
+
+    def Close(self, save_changes: bool = False):
+        pass
+
+
+class StandInDocuments:
+    def __init__(self, documents: List[StandInDocument]):
+        self._documents = documents
+
+    def __iter__(self):
+        return iter(self._documents)
+
+    def __len__(self):
+        return len(self._documents)
+
+    def Open(self, filename: str):
+        raise FileNotFoundError(f"Stand-in documents are generated, not opened: {filename}")
+
+
+class StandInApplication:
+    def __init__(self, *documents: StandInDocument):
+        self.Documents = StandInDocuments(list(documents))
+        self.ActiveDocument = documents[0] if documents else None
+
+    def ZoomExtents(self):
+        pass
+
+    def GetAcadState(self):
+        # commands are not interpreted, always done
+        return SimpleNamespace(IsQuiescent=True)
+
+
+if __name__ == '__main__':
+    count = write_dxf(generate(Settings(sheets=300), seed=1), 'synthetic.dxf')
+    print(f"{count} entities written.")
@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+from config import load_config
+from pnid import PnID
+from synthetic import Settings, StandInApplication, StandInDocument, generate
+
+CONFIG = os.path.join(os.path.dirname(__file__), '..', 'config.ini')
+
+
+@pytest.fixture
+def config() -> dict:
+    return load_config(CONFIG)
+
+
+@pytest.fixture
+def project(config):
+    """
+    Stand-in project of a seed, e.g. project(seed=1, sheets=6, defect_rate=0)
+    """
+    def make(seed: int = 0, **settings) -> PnID:
+        return PnID(app=StandInApplication(StandInDocument(generate(Settings(**settings), seed=seed))), config=config)
+    return make
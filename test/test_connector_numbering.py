@@ -0,0 +1,80 @@
+from checker.connectors import check_main, check_main_connector
+from connector_numbering import number_connectors
+from pnid import PnID
+from renumbering import renumber_sheets
+
+
+def unnumbered(pnid: PnID) -> PnID:
+    batch = pnid.new_batch()
+    for connector in pnid.main_connectors:
+        connector.set_attribute_text('TAG', '', batch)
+        connector.set_attribute_text('PID.No', '', batch)
+    batch.commit()
+    pnid.init_components()
+    return pnid
+
+
+def find(pnid: PnID, handle: str):
+    return next(connector for connector in pnid.main_connectors if connector.handle == handle)
+
+
+def test_number_connectors_restores_links(project, config):
+    links = {connector.handle: connector.link_drawing
+             for connector in project(seed=3, sheets=20, defect_rate=0).main_connectors}
+    pnid = unnumbered(project(seed=3, sheets=20, defect_rate=0))
+
+    pairings = number_connectors(pnid, config)
+
+    assert all(pairing.entry is not None for pairing in pairings)
+    pnid.init_components()
+    assert {connector.handle: connector.link_drawing for connector in pnid.main_connectors} == links
+    assert check_main(pnid, config) == []
+
+
+def test_unpaired_exit_gets_target_sheet(project, config):
+    pnid = unnumbered(project(seed=4, sheets=20, defect_rate=0))
+    entry = next(connector for connector in pnid.main_connectors if connector.is_from)
+    pnid.delete(entry.handle)
+    pnid.reload()
+
+    pairings = number_connectors(pnid, config)
+
+    unpaired = [pairing for pairing in pairings if pairing.entry is None]
+    assert len(unpaired) == 1
+    pnid.init_components()
+    exit_connector = find(pnid, unpaired[0].exit.handle)
+    assert exit_connector.link_drawing == unpaired[0].target == entry.drawing.tag
+
+
+def test_off_boundary_exit_numbered_without_target(project, config):
+    pnid = unnumbered(project(seed=5, sheets=20, defect_rate=0))
+    exit_connector = next(connector for connector in pnid.main_connectors if connector.is_to)
+    exit_connector.set_dynamic_property_value('TYPE', 'OFF-BOUNDARY')
+    exit_connector.set_attribute_text('OriginOrDestination', 'TO BATTERY LIMIT')
+    pnid.init_components()
+
+    pairings = number_connectors(pnid, config)
+
+    pairing = next(pairing for pairing in pairings if pairing.exit.handle == exit_connector.handle)
+    assert pairing.entry is None and pairing.target == ''
+    pnid.init_components()
+    exit_connector = find(pnid, exit_connector.handle)
+    assert exit_connector.tag.startswith(exit_connector.drawing.tag[-config['drawing']['number_digits']:])
+    assert exit_connector.link_drawing == ''
+    assert check_main_connector(exit_connector, config) is None
+
+
+def test_renumbering_keeps_numbered_links(project, config):
+    pnid = unnumbered(project(seed=3, sheets=6, defect_rate=0))
+    number_connectors(pnid, config)
+    pnid.init_components()
+    # P&ID No. written as full sheet tags
+    assert all(connector.link_drawing in pnid.sheets for connector in pnid.main_connectors)
+    mapping = {'P2401': 'P2402', 'P2402': 'P2401'}
+    links = {connector.handle: mapping.get(connector.link_drawing, connector.link_drawing)
+             for connector in pnid.main_connectors}
+
+    renumber_sheets(pnid, mapping, config)
+
+    assert {connector.handle: connector.link_drawing for connector in pnid.main_connectors} == links
+    assert check_main(pnid, config) == []
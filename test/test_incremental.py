@@ -0,0 +1,48 @@
+import json
+
+from checker import incremental
+
+
+def checked_sheets(monkeypatch) -> list:
+    checked = []
+    check_sheet = incremental.check_sheet
+
+    def counting(pnid, scan, config):
+        checked.append(scan.drawing.tag)
+        return check_sheet(pnid, scan, config)
+    monkeypatch.setattr(incremental, 'check_sheet', counting)
+    return checked
+
+
+def test_incremental_checks_changed_sheets_and_partners(monkeypatch, tmp_path, project, config):
+    pnid = project(seed=1, sheets=30)
+    cache = str(tmp_path / 'connectors.cache.json')
+    checked = checked_sheets(monkeypatch)
+
+    problems = incremental.check_main_incremental(pnid, config, cache)
+    assert len(checked) == 30
+
+    checked.clear()
+    # cached problems are read back from JSON
+    assert json.dumps(incremental.check_main_incremental(pnid, config, cache)) == json.dumps(problems)
+    assert checked == []
+
+    connector = pnid.main_connectors[0]
+    partners = incremental.linked_tags([connector.link_drawing], pnid.sheets, config)
+    connector.set_attribute_text('OriginOrDestination', connector.route + ' EDITED')
+    incremental.check_main_incremental(pnid, config, cache)
+    assert connector.drawing.tag in checked
+    assert partners <= set(checked)
+    assert len(checked) < 30
+
+
+def test_config_change_invalidates_cache(monkeypatch, tmp_path, project, config):
+    pnid = project(seed=2, sheets=10)
+    cache = str(tmp_path / 'connectors.cache.json')
+    checked = checked_sheets(monkeypatch)
+    incremental.check_main_incremental(pnid, config, cache)
+
+    checked.clear()
+    config['drawing']['start_unit'] += 1
+    incremental.check_main_incremental(pnid, config, cache)
+    assert len(checked) == 10
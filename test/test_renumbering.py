@@ -0,0 +1,34 @@
+from checker.connectors import check_main
+from migration import read_changelog, reverse_changes
+from pnid import PnID
+from renumbering import renumber_sheets
+
+
+def connector_states(pnid: PnID) -> dict:
+    return {connector.handle: (connector.drawing.tag, connector.tag, connector.link_drawing)
+            for connector in pnid.main_connectors}
+
+
+def test_swap_two_sheets(tmp_path, project, config):
+    pnid = project(seed=1, sheets=6, defect_rate=0)
+    digits = config['drawing']['number_digits']
+    mapping = {'P2401': 'P2402', 'P2402': 'P2401'}
+    short = {old[-digits:]: new[-digits:] for old, new in mapping.items()}
+    before = connector_states(pnid)
+    changelog = str(tmp_path / 'renumber.log')
+
+    renumber_sheets(pnid, mapping, config, changelog)
+
+    assert [drawing.tag for drawing in pnid.drawings][:2] == ['P2402', 'P2401']
+    expected = {handle: (mapping.get(sheet, sheet), short.get(tag[:digits], tag[:digits]) + tag[digits:],
+                         mapping.get(link, link))
+                for handle, (sheet, tag, link) in before.items()}
+    assert connector_states(pnid) == expected
+    assert check_main(pnid, config) == []
+
+    # reverse renumbering from the change report
+    pnid.apply_changes(reverse_changes(read_changelog(changelog)))
+    for drawing in pnid.drawings:
+        drawing.refresh()
+    pnid.init_components()
+    assert connector_states(pnid) == before
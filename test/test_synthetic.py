@@ -0,0 +1,48 @@
+from checker.connectors import check_main
+from synthetic import (MISSING_LINK, MISSING_NUMBER, MISSING_ROUTE, WRONG_DIRECTION, WRONG_NUMBER, Settings,
+                       defects, generate, sheet_tags, write_dxf)
+
+# defects found by check_main, unpaired and duplicated pairs are reported by show_links
+CHECKED = (MISSING_NUMBER, MISSING_ROUTE, WRONG_DIRECTION, WRONG_NUMBER, MISSING_LINK)
+
+
+def test_same_seed_same_project():
+    settings = Settings(sheets=5)
+    assert list(generate(settings, seed=7)) == list(generate(settings, seed=7))
+    assert list(generate(settings, seed=7)) != list(generate(settings, seed=8))
+    assert defects(settings, seed=7) == defects(settings, seed=7)
+
+
+def test_write_dxf(tmp_path):
+    settings = Settings(sheets=3)
+    specs = list(generate(settings, seed=1))
+    path = str(tmp_path / 'synthetic.dxf')
+
+    assert write_dxf(iter(specs), path) == len(specs)
+
+    with open(path, encoding='utf8') as file:
+        lines = [line.strip() for line in file]
+    pairs = list(zip(lines[::2], lines[1::2]))
+    assert pairs[:2] == [('0', 'SECTION'), ('2', 'HEADER')]
+    assert pairs[-1] == ('0', 'EOF')
+    assert ('2', 'ENTITIES') in pairs
+    blocks = {value for code, value in pairs[pairs.index(('2', 'BLOCKS')):pairs.index(('2', 'ENTITIES'))]
+              if code == '2'}
+    assert {'Border_A1', 'TitleBlock_A1', 'Connector_Main'} <= blocks
+    assert sum(1 for pair in pairs if pair in (('0', 'INSERT'), ('0', 'TEXT'))) == len(specs)
+    assert {tag for tag in sheet_tags(settings)} <= {value for code, value in pairs if code == '1'}
+
+
+def test_defects_are_detected(project, config):
+    assert defects(Settings(sheets=10, defect_rate=0), seed=2) == []
+    assert check_main(project(seed=2, sheets=10, defect_rate=0), config) == []
+
+    settings = Settings(sheets=10, defect_rate=0.5)
+    links = [link for link in defects(settings, seed=2) if link.defect in CHECKED]
+    assert links
+    tags = sheet_tags(settings)
+    problems = check_main(project(seed=2, sheets=10, defect_rate=0.5), config)
+    assert len(problems) >= len(links)
+    problem_sheets = {problem['drawing'] for problem in problems}
+    for link in links:
+        assert {tags[link.exit_sheet], tags[link.entry_sheet]} & problem_sheets, link
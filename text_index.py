@@ -0,0 +1,192 @@
+# Inverted index of attribute, Text and MText strings, built once and updated on edits
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import dxf
+from point import Point
+from tracing import tracer
+
+# words and tag-shaped compounds, e.g. "2-PG-40101-A1", "FT.1001"
+_TOKEN = re.compile(r'[A-Z0-9]+(?:[-_./][A-Z0-9]+)*')
+_PART = re.compile(r'[A-Z0-9]+')
+# MText formatting codes, e.g. "{\fArial|b0;TAG}", "\P"
+_MTEXT_CODES = re.compile(r'\\[ACFHQTWfp][^;\\]*;|\\[PLlOoKkNX~]|[{}]')
+
+
+def tokenize(text: str) -> Set[str]:
+    """
+    Upper case tokens, compounds together with their parts
+    """
+    tokens = set()
+    for compound in _TOKEN.findall(text.upper()):
+        tokens.add(compound)
+        tokens.update(_PART.findall(compound))
+    return tokens
+
+
+def plain_text(text: str) -> str:
+    return _MTEXT_CODES.sub('', text)
+
+
+class TextEntry:
+    __slots__ = ('handle', 'owner', 'tag', 'text', 'position', 'drawing')
+
+    def __init__(self, handle: str, owner: Optional[str], tag: Optional[str], text: str, position: Point,
+                 drawing=None):
+        """
+        :param handle: attribute or text handle
+        :param owner: blockref handle of an attribute
+        :param tag: attribute tag
+        :param text:
+        :param position:
+        :param drawing: Drawing containing the text
+        """
+        self.handle = handle
+        self.owner = owner
+        self.tag = tag
+        self.text = text
+        self.position = position
+        self.drawing = drawing
+
+    @property
+    def sheet(self) -> Optional[str]:
+        return self.drawing.tag if self.drawing is not None else None
+
+    def __repr__(self):
+        return f"<TextEntry {self.handle} [{self.sheet}] '{self.text}'>"
+
+
+class TextIndex:
+    """
+    Token to handles index.
+    Usage: index = doc.text_index
+           index.exact('40101'), index.prefix('2-PG-'), index.search(r'FT\\d+')
+    """
+    def __init__(self, locate: Callable[[Point], object] = None):
+        """
+        :param locate: function returns drawing of a point, e.g. PnID.locate_point
+        """
+        self.locate = locate
+        self.entries: Dict[str, TextEntry] = {}
+        self._tokens: Dict[str, Set[str]] = defaultdict(set)
+        # attribute handles by blockref handle
+        self._owned: Dict[str, Set[str]] = defaultdict(set)
+        self._sorted: Optional[List[str]] = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, handle: str):
+        return handle in self.entries
+
+    def add(self, handle: str, text: str, position: Point, owner: str = None, tag: str = None):
+        if handle in self.entries:
+            self.remove(handle)
+        drawing = self.locate(position) if self.locate is not None else None
+        self.entries[handle] = TextEntry(handle, owner, tag, text, position, drawing)
+        if owner is not None:
+            self._owned[owner].add(handle)
+        for token in tokenize(text):
+            if token not in self._tokens:
+                self._sorted = None
+            self._tokens[token].add(handle)
+
+    def remove(self, handle: str):
+        entry = self.entries.pop(handle, None)
+        if entry is None:
+            return
+        if entry.owner is not None and (owned := self._owned.get(entry.owner)) is not None:
+            owned.discard(handle)
+            if not owned:
+                del self._owned[entry.owner]
+        for token in tokenize(entry.text):
+            handles = self._tokens.get(token)
+            if handles is None:
+                continue
+            handles.discard(handle)
+            if not handles:
+                del self._tokens[token]
+                self._sorted = None
+
+    def add_blockref(self, blockref):
+        """
+        All attributes of a blockref, blank ones too, they may be filled later
+        """
+        owner = blockref.Handle
+        for attribute in blockref.GetAttributes():
+            self.add(attribute.Handle, attribute.TextString, Point(*attribute.InsertionPoint), owner,
+                     attribute.TagString)
+
+    def remove_owner(self, owner: str):
+        """
+        Attributes of a blockref
+        """
+        for handle in list(self._owned.get(owner, ())):
+            self.remove(handle)
+
+    def update(self, handle: str, text: str):
+        """
+        New text of an indexed handle, unknown handles are ignored
+        """
+        entry = self.entries.get(handle)
+        if entry is None:
+            return
+        if entry.owner is None:
+            text = plain_text(text)
+        if entry.text == text:
+            return
+        self.add(handle, text, entry.position, entry.owner, entry.tag)
+
+    def _entries(self, handles: Iterable[str]) -> List[TextEntry]:
+        return sorted((self.entries[handle] for handle in handles), key=lambda entry: entry.handle)
+
+    def exact(self, token: str) -> List[TextEntry]:
+        return self._entries(self._tokens.get(token.upper(), ()))
+
+    @property
+    def tokens(self) -> List[str]:
+        if self._sorted is None:
+            self._sorted = sorted(self._tokens)
+        return self._sorted
+
+    def prefix(self, prefix: str) -> List[TextEntry]:
+        prefix = prefix.upper()
+        tokens = self.tokens
+        handles = set()
+        for i in range(bisect_left(tokens, prefix), len(tokens)):
+            if not tokens[i].startswith(prefix):
+                break
+            handles |= self._tokens[tokens[i]]
+        return self._entries(handles)
+
+    def search(self, pattern: str) -> List[TextEntry]:
+        """
+        Texts having a token fully matched by the regex, case insensitive
+        """
+        regex = re.compile(pattern, re.IGNORECASE)
+        handles = set()
+        for token, token_handles in self._tokens.items():
+            if regex.fullmatch(token):
+                handles |= token_handles
+        return self._entries(handles)
+
+
+def build_text_index(doc, locate: Callable[[Point], object] = None) -> TextIndex:
+    """
+    Read every attribute, Text and MText once
+    :param doc: CADDoc
+    :param locate: function returns drawing of a point
+    """
+    index = TextIndex(locate)
+    with tracer.span("build_text_index") as span:
+        for blockref in doc.select_blockrefs():
+            index.add_blockref(blockref)
+        for m_text in doc.select_entities(dxf.MText):
+            index.add(m_text.Handle, plain_text(m_text.TextString), Point(*m_text.InsertionPoint))
+        for text in doc.select_entities(dxf.Text):
+            index.add(text.Handle, text.TextString, Point(*text.InsertionPoint))
+        span.count(texts=len(index), tokens=len(index.tokens))
+    print(f"Indexed {len(index)} texts.")
+    return index
@@ -0,0 +1,223 @@
+# Pipe topology from Line/LWPolyline geometry, endpoints snapped by a spatial hash, segments split at T-junctions
+from collections import defaultdict, deque
+from math import ceil, hypot
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import dxf
+from point import Point
+from spatial import GridIndex
+
+
+class Segment(NamedTuple):
+    handle: str
+    start: Point
+    end: Point
+
+
+class Anchor(NamedTuple):
+    kind: str
+    handle: str
+    position: Point
+
+
+def read_lines(lines: Iterable) -> List[Segment]:
+    return [Segment(line.Handle, Point(*line.StartPoint), Point(*line.EndPoint)) for line in lines]
+
+
+def read_polylines(polylines: Iterable) -> List[Segment]:
+    """
+    One Coordinates read per polyline, split into segments
+    """
+    segments = []
+    for polyline in polylines:
+        handle = polyline.Handle
+        coordinates = polyline.Coordinates
+        points = [Point(coordinates[i], coordinates[i + 1]) for i in range(0, len(coordinates) - 1, 2)]
+        if polyline.Closed and len(points) > 2:
+            points.append(points[0])
+        segments.extend(Segment(handle, start, end) for start, end in zip(points, points[1:]))
+    return segments
+
+
+def read_segments(doc) -> List[Segment]:
+    """
+    All 2D line segments of the document
+    :param doc: CADDoc
+    """
+    line, polyline = dxf.All2DLines
+    return read_lines(doc.select_entities(line)) + read_polylines(doc.select_entities(polyline))
+
+
+class PipeGraph:
+    """
+    Connectivity graph, nodes are snapped points, edges are segments
+    """
+    def __init__(self, tolerance: float = 1):
+        self.tolerance = tolerance
+        self.nodes: List[Point] = []
+        self.edges: List[Tuple[int, int, Segment]] = []
+        self.adjacency: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+        self.anchors: Dict[int, List[Anchor]] = defaultdict(list)
+        self._index = GridIndex(tolerance)
+
+    def snap(self, point: Point) -> int:
+        """
+        Node of the point, a new node is created if no node within tolerance
+        """
+        found = self._index.nearest(point, self.tolerance)
+        if found is not None:
+            return found[2]
+        node = len(self.nodes)
+        self.nodes.append(Point(point.x, point.y))
+        self._index.insert(point, node)
+        return node
+
+    def add_segment(self, segment: Segment):
+        start = self.snap(segment.start)
+        end = self.snap(segment.end)
+        if start == end:
+            return
+        self._add_edge(start, end, segment)
+
+    def _add_edge(self, start: int, end: int, segment: Segment):
+        edge = len(self.edges)
+        self.edges.append((start, end, segment))
+        self.adjacency[start].append((end, edge))
+        self.adjacency[end].append((start, edge))
+
+    def nodes_on(self, start: int, end: int) -> List[int]:
+        """
+        Nodes within tolerance of the edge between start and end, other than its ends, ordered from start.
+        Looked up in the grid index at points along the edge.
+        """
+        a, b = self.nodes[start], self.nodes[end]
+        dx, dy = b.x - a.x, b.y - a.y
+        length = hypot(dx, dy)
+        if length == 0:
+            return []
+        steps = ceil(length / self.tolerance)
+        found: Dict[int, float] = {}
+        for i in range(steps + 1):
+            t = i / steps
+            for _, _, node in self._index.nearby(Point(a.x + dx * t, a.y + dy * t), self.tolerance * 2):
+                if node in (start, end) or node in found:
+                    continue
+                point = self.nodes[node]
+                # position along the edge, distance from the edge
+                u = ((point.x - a.x) * dx + (point.y - a.y) * dy) / (length * length)
+                if 0 < u < 1 and abs((point.x - a.x) * dy - (point.y - a.y) * dx) / length <= self.tolerance:
+                    found[node] = u
+        return sorted(found, key=found.get)
+
+    def split_junctions(self) -> int:
+        """
+        Split edges at segment endpoints lying on them, so T-junctions are connected
+        :return: number of edges added
+        """
+        edges = self.edges
+        self.edges = []
+        self.adjacency = defaultdict(list)
+        for start, end, segment in edges:
+            chain = [start] + self.nodes_on(start, end) + [end]
+            for node, other in zip(chain, chain[1:]):
+                self._add_edge(node, other, segment)
+        return len(self.edges) - len(edges)
+
+    def add_anchor(self, anchor: Anchor) -> int:
+        node = self.snap(anchor.position)
+        self.anchors[node].append(anchor)
+        return node
+
+    def neighbours(self, node: int) -> List[int]:
+        return [other for other, _ in self.adjacency.get(node, ())]
+
+    def trace(self, start: int) -> Tuple[Set[int], List[Anchor]]:
+        """
+        Walk a run from the start node until other anchors are reached
+        :return: (visited nodes, anchors reached)
+        """
+        visited = {start}
+        reached = []
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            for other in self.neighbours(node):
+                if other in visited:
+                    continue
+                visited.add(other)
+                if other in self.anchors:
+                    # stop at equipment or connectors
+                    reached.extend(self.anchors[other])
+                else:
+                    queue.append(other)
+        return visited, reached
+
+    def runs(self) -> List[Tuple[Anchor, Anchor]]:
+        """
+        Pairs of anchors connected by pipe runs
+        """
+        pairs = set()
+        for node, anchors in self.anchors.items():
+            _, reached = self.trace(node)
+            for anchor in anchors:
+                for other in reached:
+                    if anchor != other:
+                        pairs.add(tuple(sorted((anchor, other))))
+        return sorted(pairs)
+
+    def components(self) -> List[Set[int]]:
+        """
+        Connected groups of nodes
+        """
+        seen: Set[int] = set()
+        groups = []
+        for node in range(len(self.nodes)):
+            if node in seen:
+                continue
+            group = {node}
+            queue = deque([node])
+            while queue:
+                for other in self.neighbours(queue.popleft()):
+                    if other not in group:
+                        group.add(other)
+                        queue.append(other)
+            seen |= group
+            groups.append(group)
+        return groups
+
+
+def connector_anchors(pnid) -> List[Anchor]:
+    anchors = []
+    for connector in pnid.main_connectors + pnid.utility_connectors:
+        handle = connector.handle
+        kind = type(connector).__name__
+        anchors.append(Anchor(kind, handle, connector.left_anchor))
+        anchors.append(Anchor(kind, handle, connector.right_anchor))
+    return anchors
+
+
+def block_anchors(pnid, blockrefs: Iterable) -> List[Anchor]:
+    # EffectiveName read once per anonymous block, see CADDoc.effective_name
+    return [Anchor(pnid.effective_name(blockref), blockref.Handle, Point(*blockref.InsertionPoint))
+            for blockref in blockrefs]
+
+
+def build_topology(pnid, tolerance: float = 1, blockrefs: Optional[Iterable] = None) -> PipeGraph:
+    """
+    Pipe graph with connector anchors and block insertion points
+    :param pnid: PnID
+    :param tolerance: snap distance of endpoints
+    :param blockrefs: blocks as equipment anchors, e.g. pnid.find_blockrefs(...)
+    """
+    graph = PipeGraph(tolerance)
+    for segment in read_segments(pnid):
+        graph.add_segment(segment)
+    # T-junctions connected before anchors are snapped
+    graph.split_junctions()
+    for anchor in connector_anchors(pnid):
+        graph.add_anchor(anchor)
+    if blockrefs is not None:
+        for anchor in block_anchors(pnid, blockrefs):
+            graph.add_anchor(anchor)
+    print(f"{len(graph.nodes)} nodes, {len(graph.edges)} edges, {len(graph.anchors)} anchored nodes.")
+    return graph
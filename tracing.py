@@ -0,0 +1,148 @@
+# Phase timing and memory spans, dumped as json for comparison across runs
+# Usage: tracer.enable(memory=True)
+#        with tracer.span("load_drawings") as span:
+#            span.count(drawings=len(drawings))
+#        tracer.dump("trace.json")
+import json
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+
+class Span:
+    def __init__(self, tracer: 'Tracer', name: str, counts: dict):
+        self.tracer = tracer
+        self.name = name
+        self.counts = counts
+        self.depth = 0
+        self.start = 0.0
+        self.wall = 0.0
+        self.peak_memory: Optional[int] = None
+
+    def count(self, **counts):
+        self.counts.update(counts)
+
+    def __enter__(self):
+        self.tracer._enter(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.wall = time.perf_counter() - self.start
+        self.tracer._exit(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "depth": self.depth,
+            "wall": round(self.wall, 6),
+            "counts": self.counts,
+            "peak_memory": self.peak_memory,
+        }
+
+
+class _NullSpan:
+    """
+    Shared span when tracing is disabled
+    """
+    def count(self, **counts):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.spans: List[Span] = []
+        self._stack: List[Span] = []
+
+    def enable(self, memory: bool = False):
+        """
+        :param memory: record tracemalloc peak of each span, slows down the run
+        """
+        self.enabled = True
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        self.enabled = False
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.memory = False
+
+    def reset(self):
+        self.spans = []
+        self._stack = []
+
+    def span(self, name: str, **counts):
+        if not self.enabled:
+            return _null_span
+        return Span(self, name, counts)
+
+    def _enter(self, span: Span):
+        span.depth = len(self._stack)
+        if self.memory:
+            # keep peak of the running parent before resetting
+            if self._stack:
+                parent = self._stack[-1]
+                parent.peak_memory = max(parent.peak_memory or 0, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._stack.append(span)
+        self.spans.append(span)
+
+    def _exit(self, span: Span):
+        self._stack.pop()
+        if self.memory:
+            span.peak_memory = max(span.peak_memory or 0, tracemalloc.get_traced_memory()[1])
+            if self._stack:
+                parent = self._stack[-1]
+                parent.peak_memory = max(parent.peak_memory or 0, span.peak_memory)
+
+    def to_dict(self) -> dict:
+        return {"spans": [span.to_dict() for span in self.spans]}
+
+    def dump(self, path: str):
+        with open(path, 'w', encoding='utf8') as file:
+            json.dump(self.to_dict(), file, ensure_ascii=False, indent=1)
+
+
+def load_trace(path: str) -> List[dict]:
+    with open(path, encoding='utf8') as file:
+        return json.load(file)["spans"]
+
+
+def total_by_name(spans: List[dict]) -> Dict[str, float]:
+    totals = {}
+    for span in spans:
+        totals[span["name"]] = totals.get(span["name"], 0) + span["wall"]
+    return totals
+
+
+def compare(base_path: str, other_path: str) -> Dict[str, tuple]:
+    """
+    Compare wall time by span name of two traces
+    :return: {name: (base wall, other wall, ratio)}
+    """
+    base = total_by_name(load_trace(base_path))
+    other = total_by_name(load_trace(other_path))
+    result = {}
+    for name in base.keys() | other.keys():
+        base_wall = base.get(name, 0)
+        other_wall = other.get(name, 0)
+        ratio = other_wall / base_wall if base_wall else None
+        result[name] = (base_wall, other_wall, ratio)
+    return result
+
+
+tracer = Tracer()
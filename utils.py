@@ -1,28 +1,91 @@
-from typing import List
-
-import win32com
-from win32com.client import VARIANT
-import pythoncom as p
+import re
+from typing import Iterable, List
+
+try:
+    import win32com
+    import win32com.client
+    from win32com.client import VARIANT, CastTo
+    import pythoncom as p
+    from pywintypes import com_error
+except ImportError:
+    # no pywin32, e.g. replaying a recorded session on linux, see recording.py
+    win32com = None
+
+    class com_error(Exception):
+        pass
 
 from point import Point
 
 
-def vt_int_array(values: List[int]) -> VARIANT:
+def vt_int_array(values: List[int]) -> 'VARIANT':
+    if win32com is None:
+        return list(values)
     return VARIANT(p.VT_ARRAY | p.VT_I2, values)
 
 
-def vt_variant_array(values: List) -> VARIANT:
+def vt_variant_array(values: List) -> 'VARIANT':
+    if win32com is None:
+        return list(values)
     return VARIANT(p.VT_ARRAY | p.VT_VARIANT, values)
 
 
-def vt_variant_short_int(value: int) -> VARIANT:
+def vt_object_array(values: List) -> 'VARIANT':
+    if win32com is None:
+        return list(values)
+    return VARIANT(p.VT_ARRAY | p.VT_DISPATCH, values)
+
+
+def vt_variant_short_int(value: int) -> 'VARIANT':
+    if win32com is None:
+        return value
     return VARIANT(p.VT_I2, value)
 
 
-def vt_point(point: Point) -> VARIANT:
+def vt_point(point: Point) -> 'VARIANT':
+    if win32com is None:
+        return point.x, point.y, point.z
     return VARIANT(p.VT_ARRAY | p.VT_R8, (point.x, point.y, point.z))
 
 
+def lisp_point(point: Point) -> str:
+    return f"'({point.x} {point.y} {point.z})"
+
+
+def cast_to(obj, interface: str):
+    """
+    CastTo, also for recording and replaying proxies
+    """
+    if hasattr(type(obj), '_cast'):
+        return obj._cast(interface)
+    return CastTo(obj, interface)
+
+
+def join_filter_names(names: Iterable[str], max_length: int = 1024) -> List[str]:
+    """
+    Comma separated selection filter values, each at most max_length long
+    """
+    filters = []
+    current = []
+    length = 0
+    for name in names:
+        if current and length + len(name) + 1 > max_length:
+            filters.append(",".join(current))
+            current = []
+            length = 0
+        current.append(name)
+        length += len(name) + 1
+    if current:
+        filters.append(",".join(current))
+    return filters
+
+
+def escape_wildcards(name: str) -> str:
+    """
+    Escape wildcard characters for selection filter, e.g. layer name "A#1" -> "A`#1"
+    """
+    return re.sub(r'([#@.*?~\[\]`,-])', r'`\1', name)
+
+
 def extract_attributes(blockref) -> dict:
     return {attr.TagString.lower(): attr.TextString for attr in blockref.GetAttributes()}
 
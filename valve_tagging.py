@@ -1,7 +1,15 @@
 # -*- coding: utf-8 -*-
+# Auto tagging valves per drawing, as '<type code>-<dwg number><seq>'
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import dxf
+from components import Valve
+from ordering import COLUMNS, order_items
 from pnid import PnID
-from pprint import PrettyPrinter
-import time
+from point import Point
+from spatial import GridIndex
+from tracing import tracer
 
 
 def get_type_code(type_name):
@@ -20,38 +28,107 @@ def get_type_code(type_name):
     return None
 
 
-start_time = time.time()
-# pnid = PnID(r'D:\Work\Project\XY2019P02-KAYAN.25MMSCFD.LNG\PnID\After.HAZOP\KAYAN.LNG.TRAIN.PnID_2020.0910.dwg')
-pnid = PnID(r'D:\Incoming\temptask\test_for_autotag.dwg')
-valves = dict()
-counter = 0
-for valve in pnid.valves:
-    dwg_number = pnid.locate_dwg_no(valve.pos)
-    if dwg_number:
-        dwg_number = dwg_number[-4::]
-        # select specific drawing
-        # if int(dwg_number) // 100 != 7:
-        #     continue
-    else:
-        continue
-    if dwg_number not in valves:
-        valves[dwg_number] = dict()
-    if valve.type_name not in valves[dwg_number]:
-        valves[dwg_number][valve.type_name] = []
-    valves[dwg_number][valve.type_name].append(valve)
-    if type_code := get_type_code(valve.type_name):
-        valve.v_type = type_code
-        valve._number = f'{dwg_number}{len(valves[dwg_number][valve.type_name]):02d}'
-        # tagging, exclude legends
-        if int(dwg_number) > 99:
-            tag_handle = pnid.doc.HandleToObject(valve.tag_handle)
-            tag_handle.TextString = valve.tag
-            tag_handle.Height = 2.5
-            tag_handle.ScaleFactor = 0.6
-            counter += 1
-print(f'{counter} valves processed.')
-end_time = time.time()
-time_spent = end_time - start_time
-print('Time spent: %.2fs' % time_spent)
-# pp = PrettyPrinter()
-# pp.pprint(valves)
+def index_tag_texts(pnid: PnID, cell_size: float) -> Dict:
+    """
+    Read all texts once, bucket them by drawing into grid indexes
+    :return: {drawing: GridIndex}
+    """
+    indexes = defaultdict(lambda: GridIndex(cell_size))
+    for text in pnid.select_entities(dxf.Text):
+        point = Point(*text.InsertionPoint)
+        if drawing := pnid.locate_point(point):
+            indexes[drawing].insert(point, text)
+    return indexes
+
+
+def group_valves(valves: List[Valve], digits: int = 4, reading_order: str = COLUMNS,
+                 tolerance: float = 1) -> Dict[str, Dict[str, List[Valve]]]:
+    """
+    Group valves by drawing number and valve type, in reading order of the drawing
+    :return: {dwg_number: {type_name: [valve, ...]}}
+    """
+    positions = {valve: valve.position for valve in valves}
+    groups = defaultdict(lambda: defaultdict(list))
+    for valve in order_items(valves, positions.__getitem__, reading_order, tolerance):
+        if valve.drawing is None or not valve.drawing.tag:
+            continue
+        groups[valve.drawing.tag[-digits:]][valve.type_name].append(valve)
+    return groups
+
+
+def number_valves(groups: Dict[str, Dict[str, List[Valve]]]) -> List[Valve]:
+    numbered = []
+    for dwg_number, types in groups.items():
+        for type_name, valves in types.items():
+            if type_code := get_type_code(type_name):
+                for seq, valve in enumerate(valves, start=1):
+                    valve.code = type_code
+                    valve.dwg_number = dwg_number
+                    valve.number = f'{dwg_number}{seq:02d}'
+                    numbered.append(valve)
+    return numbered
+
+
+def assign_tag_texts(valves: List[Valve], indexes: Dict, tag_distance: float) -> List[Tuple[Valve, object]]:
+    """
+    One text for one valve, closest pairs first
+    :param indexes: {drawing: GridIndex} of texts, see index_tag_texts
+    :return: [(valve, text)] in valve order
+    """
+    pairs = []
+    for i, valve in enumerate(valves):
+        if valve.drawing in indexes:
+            for distance, _, text in indexes[valve.drawing].nearby(valve.position, tag_distance):
+                pairs.append((distance, i, id(text), text))
+    pairs.sort(key=lambda pair: pair[:3])
+    texts = {}
+    used_texts = set()
+    for _, i, text_id, text in pairs:
+        if i in texts or text_id in used_texts:
+            continue
+        texts[i] = text
+        used_texts.add(text_id)
+    return [(valves[i], texts[i]) for i in sorted(texts)]
+
+
+def tag_valves(pnid: PnID, tag_distance: float = 10, min_dwg_number: int = 100, digits: int = 4,
+               height: float = 2.5, scale_factor: float = 0.6) -> int:
+    """
+    Number valves and write tags to the nearest text of each valve
+    :param pnid:
+    :param tag_distance: max distance between a valve and its tag text
+    :param min_dwg_number: drawings numbered below are legends, excluded
+    :param digits: digits of drawing number used in valve number
+    :param height: text height of valve tag
+    :param scale_factor: text width factor of valve tag
+    :return: number of tagged valves
+    """
+    with tracer.span('number_valves') as span:
+        valves = number_valves(group_valves(pnid.get_valves(), digits))
+        span.count(valves=len(valves))
+    with tracer.span('index_tag_texts'):
+        indexes = index_tag_texts(pnid, tag_distance)
+    with tracer.span('assign_tag_texts'):
+        # legend or unnumbered drawings
+        valves = [valve for valve in valves
+                  if valve.dwg_number.isdigit() and int(valve.dwg_number) >= min_dwg_number]
+        assigned = assign_tag_texts(valves, indexes, tag_distance)
+    batch = pnid.new_batch()
+    for valve, text in assigned:
+        valve.tag_text = text
+        batch.set(text, 'TextString', valve.tag)
+        batch.set(text, 'Height', height)
+        batch.set(text, 'ScaleFactor', scale_factor)
+
+    batch.commit()
+    return len(assigned)
+
+
+if __name__ == '__main__':
+    tracer.enable()
+    with tracer.span('valve_tagging') as span:
+        counter = tag_valves(PnID())
+        span.count(valves=counter)
+    print(f'{counter} valves processed.')
+    print('Time spent: %.2fs' % span.wall)
+    tracer.dump('valve_tagging.trace.json')